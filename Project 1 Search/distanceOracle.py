@@ -0,0 +1,118 @@
+# distanceOracle.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+This file contains a DistanceOracle, which answers maze distance queries
+between any two open cells of a layout in O(1).
+
+All-pairs distances are computed once per layout with a BFS from every open
+cell and stored in a flat array of unsigned shorts indexed by cell id.  The
+table is shared by every oracle built for the same layout text in this
+process, and is also written to a cache file (see cacheFiles.py) so that
+later processes can map it into memory instead of recomputing it.
+
+Example:
+oracle = getDistanceOracle(gameState.data.layout)
+oracle.getDistance( (1,1), (10,10) )
+"""
+
+import array
+import hashlib
+import os
+import sys
+from collections import deque
+
+import cacheFiles
+
+UNREACHABLE = 0xFFFF
+CACHE_DIR = cacheFiles.getCacheDirectory('distances')
+
+_oracles = {}
+
+def getDistanceOracle(layout, cacheDir=CACHE_DIR):
+    """
+    Returns the DistanceOracle for a layout, building or loading its distance
+    table the first time the layout text is seen in this process.
+    """
+    # Hashing the layout text costs more than a lookup, so the oracle is
+    # also remembered by the layout itself
+    try:
+        return layout.distanceOracle
+    except AttributeError:
+        pass
+    key = layoutKey(layout)
+    if key not in _oracles:
+        _oracles[key] = DistanceOracle(layout.walls, key, cacheDir)
+    layout.distanceOracle = _oracles[key]
+    return layout.distanceOracle
+
+def layoutKey(layout):
+    "A stable hash of the layout text, used to name the cache file."
+    return hashlib.sha1('\n'.join(layout.layoutText).encode()).hexdigest()
+
+class DistanceOracle:
+    def __init__(self, walls, key=None, cacheDir=CACHE_DIR):
+        """
+        walls: the walls Grid of the layout
+        key: the layout hash naming the cache file; None disables the disk cache
+        """
+        self.cells = walls.asList(False)
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.size = len(self.cells)
+        self.distances = None
+        path = None
+        if key is not None and cacheDir is not None:
+            path = os.path.join(cacheDir, '%s-%s.dist' % (key, sys.byteorder))
+            cacheKey = 'DistanceOracle %s %s %d' % (key, sys.byteorder, self.size)
+            table = cacheFiles.loadCacheFile(path, cacheKey, 2 * self.size * self.size)
+            if table is not None:
+                self.distances = table.cast('H')
+        if self.distances is None:
+            self.distances = self._compute(walls)
+            if path is not None:
+                cacheFiles.saveCacheFile(path, cacheKey, self.distances)
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two open cells, or None if one
+        cannot be reached from the other.
+        """
+        distance = self.distances[self.cellIds[pos1] * self.size + self.cellIds[pos2]]
+        if distance == UNREACHABLE:
+            return None
+        return distance
+
+    def _compute(self, walls):
+        size, cellIds = self.size, self.cellIds
+        neighbors = []
+        for x, y in self.cells:
+            adjacent = []
+            for nextCell in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if nextCell in cellIds:
+                    adjacent.append(cellIds[nextCell])
+            neighbors.append(adjacent)
+
+        distances = array.array('H', [UNREACHABLE]) * (size * size)
+        for source in range(size):
+            row = source * size
+            distances[row + source] = 0
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                nextDistance = distances[row + node] + 1
+                for other in neighbors[node]:
+                    if distances[row + other] == UNREACHABLE:
+                        distances[row + other] = nextDistance
+                        queue.append(other)
+        return distances
@@ -14,9 +14,35 @@
 
 import search
 import random
+import math
+import os
+
+import cacheFiles
 
 # Module Classes
 
+MOVES = (('up', -1, 0), ('down', 1, 0), ('left', 0, -1), ('right', 0, 1))
+
+_moveTables = {}
+
+def getMoveTable(rows, cols):
+    """
+    Returns, for every cell index of a rows x cols board, the list of
+    (move, cellIndex) pairs the blank can take from that cell.  Tables are
+    built once per board shape and shared by every puzzle of that shape.
+    """
+    if (rows, cols) not in _moveTables:
+        table = []
+        for index in range(rows * cols):
+            row, col = divmod(index, cols)
+            moves = []
+            for move, dr, dc in MOVES:
+                if 0 <= row + dr < rows and 0 <= col + dc < cols:
+                    moves.append((move, (row + dr) * cols + col + dc))
+            table.append(moves)
+        _moveTables[(rows, cols)] = table
+    return _moveTables[(rows, cols)]
+
 class EightPuzzleState:
     """
     The Eight Puzzle is described in the course textbook on
@@ -25,15 +51,18 @@ class EightPuzzleState:
     This class defines the mechanics of the puzzle itself.  The
     task of recasting this puzzle as a search problem is left to
     the EightPuzzleSearchProblem class.
+
+    Any rows x cols sliding puzzle is supported; the default is the
+    3x3 eight puzzle, or the largest square board the numbers fill.
     """
 
-    def __init__( self, numbers ):
+    def __init__( self, numbers, rows=None, cols=None ):
         """
-          Constructs a new eight puzzle from an ordering of numbers.
+          Constructs a new puzzle from an ordering of numbers.
 
-        numbers: a list of integers from 0 to 8 representing an
-          instance of the eight puzzle.  0 represents the blank
-          space.  Thus, the list
+        numbers: a list of integers from 0 to rows * cols - 1 representing
+          an instance of the puzzle, read row by row.  0 represents the
+          blank space.  Thus, the list
 
             [1, 0, 2, 3, 4, 5, 6, 7, 8]
 
@@ -46,18 +75,37 @@ class EightPuzzleState:
             | 6 | 7 | 8 |
             ------------
 
-        The configuration of the puzzle is stored in a 2-dimensional
-        list (a list of lists) 'cells'.
+        The configuration of the puzzle is stored as a flat tuple 'cells'
+        in row-major order, with the index of the blank in 'blank'.
         """
-        self.cells = []
-        numbers = numbers[:] # Make a copy so as not to cause side-effects.
-        numbers.reverse()
-        for row in range( 3 ):
-            self.cells.append( [] )
-            for col in range( 3 ):
-                self.cells[row].append( numbers.pop() )
-                if self.cells[row][col] == 0:
-                    self.blankLocation = row, col
+        numbers = tuple(numbers)
+        if rows is None and cols is None:
+            rows = cols = math.isqrt(len(numbers))
+        elif rows is None:
+            rows = len(numbers) // cols
+        elif cols is None:
+            cols = len(numbers) // rows
+        if rows * cols != len(numbers) or sorted(numbers) != list(range(len(numbers))):
+            raise Exception('Not a %dx%d puzzle: %s' % (rows, cols, str(numbers)))
+        self.rows = rows
+        self.cols = cols
+        self.cells = numbers
+        self.blank = numbers.index(0)
+
+    def _withCells( self, cells, blank ):
+        "Builds a puzzle of the same shape without re-validating the cells."
+        puzzle = EightPuzzleState.__new__(EightPuzzleState)
+        puzzle.rows = self.rows
+        puzzle.cols = self.cols
+        puzzle.cells = cells
+        puzzle.blank = blank
+        return puzzle
+
+    def getBlankLocation( self ):
+        "Returns the (row, col) of the blank space."
+        return divmod(self.blank, self.cols)
+
+    blankLocation = property(getBlankLocation)
 
     def isGoal( self ):
         """
@@ -77,12 +125,11 @@ class EightPuzzleState:
         >>> EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).isGoal()
         False
         """
-        current = 0
-        for row in range( 3 ):
-            for col in range( 3 ):
-                if current != self.cells[row][col]:
-                    return False
-                current += 1
+        if self.blank != 0:
+            return False
+        for index, number in enumerate(self.cells):
+            if index != number:
+                return False
         return True
 
     def legalMoves( self ):
@@ -95,17 +142,7 @@ class EightPuzzleState:
         >>> EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8]).legalMoves()
         ['down', 'right']
         """
-        moves = []
-        row, col = self.blankLocation
-        if(row != 0):
-            moves.append('up')
-        if(row != 2):
-            moves.append('down')
-        if(col != 0):
-            moves.append('left')
-        if(col != 2):
-            moves.append('right')
-        return moves
+        return [move for move, _ in getMoveTable(self.rows, self.cols)[self.blank]]
 
     def result(self, move):
         """
@@ -113,37 +150,29 @@ class EightPuzzleState:
         updated based on the provided move.
 
         The move should be a string drawn from a list returned by legalMoves.
-        Illegal moves will raise an exception, which may be an array bounds
-        exception.
+        Illegal moves will raise an exception.
 
         NOTE: This function *does not* change the current object.  Instead,
         it returns a new object.
         """
-        row, col = self.blankLocation
-        if(move == 'up'):
-            newrow = row - 1
-            newcol = col
-        elif(move == 'down'):
-            newrow = row + 1
-            newcol = col
-        elif(move == 'left'):
-            newrow = row
-            newcol = col - 1
-        elif(move == 'right'):
-            newrow = row
-            newcol = col + 1
-        else:
-            raise "Illegal Move"
-
-        # Create a copy of the current eightPuzzle
-        newPuzzle = EightPuzzleState([0, 0, 0, 0, 0, 0, 0, 0, 0])
-        newPuzzle.cells = [values[:] for values in self.cells]
-        # And update it to reflect the move
-        newPuzzle.cells[row][col] = self.cells[newrow][newcol]
-        newPuzzle.cells[newrow][newcol] = self.cells[row][col]
-        newPuzzle.blankLocation = newrow, newcol
-
-        return newPuzzle
+        for legalMove, target in getMoveTable(self.rows, self.cols)[self.blank]:
+            if legalMove == move:
+                return self._moveBlank(target)
+        raise Exception('Illegal move: %s' % str(move))
+
+    def _moveBlank(self, target):
+        "Returns the puzzle with the blank swapped with the tile at index target."
+        cells = list(self.cells)
+        cells[self.blank] = cells[target]
+        cells[target] = 0
+        return self._withCells(tuple(cells), target)
+
+    def getTilePositions(self):
+        "Returns a list whose i-th entry is the cell index holding tile i."
+        positions = [0] * len(self.cells)
+        for index, number in enumerate(self.cells):
+            positions[number] = index
+        return positions
 
     # Utilities for comparison and display
     def __eq__(self, other):
@@ -155,27 +184,25 @@ class EightPuzzleState:
               EightPuzzleState([1, 0, 2, 3, 4, 5, 6, 7, 8]).result('left')
           True
         """
-        for row in range( 3 ):
-            if self.cells[row] != other.cells[row]:
-                return False
-        return True
+        return other is not None and self.cells == other.cells and self.cols == other.cols
 
     def __hash__(self):
-        return hash(str(self.cells))
+        return hash(self.cells)
 
     def __getAsciiString(self):
         """
           Returns a display string for the maze
         """
+        width = len(str(len(self.cells) - 1))
         lines = []
-        horizontalLine = ('-' * (13))
+        horizontalLine = ('-' * (1 + (width + 3) * self.cols))
         lines.append(horizontalLine)
-        for row in self.cells:
+        for row in range(self.rows):
             rowLine = '|'
-            for col in row:
+            for col in self.cells[row * self.cols:(row + 1) * self.cols]:
                 if col == 0:
                     col = ' '
-                rowLine = rowLine + ' ' + col.__str__() + ' |'
+                rowLine = rowLine + ' ' + str(col).rjust(width) + ' |'
             lines.append(rowLine)
             lines.append(horizontalLine)
         return '\n'.join(lines)
@@ -183,8 +210,6 @@ class EightPuzzleState:
     def __str__(self):
         return self.__getAsciiString()
 
-# TODO: Implement The methods in this class
-
 class EightPuzzleSearchProblem(search.SearchProblem):
     """
       Implementation of a SearchProblem for the  Eight Puzzle domain
@@ -194,9 +219,10 @@ class EightPuzzleSearchProblem(search.SearchProblem):
     def __init__(self,puzzle):
         "Creates a new EightPuzzleSearchProblem which stores search information."
         self.puzzle = puzzle
+        self._expanded = 0
 
     def getStartState(self):
-        return puzzle
+        return self.puzzle
 
     def isGoalState(self,state):
         return state.isGoal()
@@ -207,9 +233,10 @@ class EightPuzzleSearchProblem(search.SearchProblem):
           each succesor is either left, right, up, or down
           from the original state and the cost is 1.0 for each
         """
+        self._expanded += 1
         succ = []
-        for a in state.legalMoves():
-            succ.append((state.result(a), a, 1))
+        for move, target in getMoveTable(state.rows, state.cols)[state.blank]:
+            succ.append((state._moveBlank(target), move, 1))
         return succ
 
     def getCostOfActions(self, actions):
@@ -221,6 +248,111 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         """
         return len(actions)
 
+# Pattern databases
+
+UNSEEN = 0xFF
+CACHE_DIR = cacheFiles.getCacheDirectory('pdb')
+
+_databases = {}
+
+def defaultPartition(rows, cols, patternSize=None):
+    """
+    Splits the tiles of a rows x cols puzzle into consecutive groups: two
+    groups of four for the eight puzzle, three groups of five for the
+    fifteen puzzle.
+    """
+    tiles = list(range(1, rows * cols))
+    if patternSize is None:
+        patternSize = 4 if len(tiles) <= 8 else 5
+    return tuple(tuple(tiles[i:i + patternSize]) for i in range(0, len(tiles), patternSize))
+
+def getPatternDatabases(rows, cols, partition=None, cacheDir=CACHE_DIR):
+    """
+    Returns the PatternDatabases for a disjoint partition of the tiles,
+    building or loading each table the first time it is used in this process.
+    """
+    if partition is None:
+        partition = defaultPartition(rows, cols)
+    key = (rows, cols, tuple(tuple(tiles) for tiles in partition))
+    if key not in _databases:
+        _databases[key] = [PatternDatabase(rows, cols, tiles, cacheDir) for tiles in key[2]]
+    return _databases[key]
+
+class PatternDatabase:
+    """
+    The exact number of moves of a group of tiles needed to bring them to
+    their goal cells, ignoring the other tiles, for every placement of the
+    group.
+
+    Only moves of tiles in the group are counted, so the values of databases
+    over disjoint groups can be added and still never overestimate.  The
+    table is built by a breadth first search backwards from the goal and
+    stored as one byte per placement, indexed by the cell of each tile
+    written as a base rows * cols number.
+    """
+    def __init__(self, rows, cols, tiles, cacheDir=CACHE_DIR):
+        self.rows = rows
+        self.cols = cols
+        self.tiles = tuple(tiles)
+        self.size = rows * cols
+        self.weights = [self.size ** i for i in range(len(self.tiles))]
+        if self.size ** len(self.tiles) > 1 << 28:
+            raise Exception('Pattern of %d tiles is too large for a %dx%d puzzle' %
+                            (len(self.tiles), rows, cols))
+        self.table = None
+        path = None
+        if cacheDir is not None:
+            name = '%dx%d-%s.pdb' % (rows, cols, '_'.join(map(str, self.tiles)))
+            path = os.path.join(cacheDir, name)
+            cacheKey = 'PatternDatabase %dx%d %s' % (rows, cols, ' '.join(map(str, self.tiles)))
+            self.table = cacheFiles.loadCacheFile(path, cacheKey, self.size ** len(self.tiles))
+        if self.table is None:
+            self.table = self._compute()
+            if path is not None:
+                cacheFiles.saveCacheFile(path, cacheKey, self.table)
+
+    def getValue(self, positions):
+        """
+        positions: the cell of every tile, as returned by getTilePositions
+        """
+        index = 0
+        for tile, weight in zip(self.tiles, self.weights):
+            index += positions[tile] * weight
+        return self.table[index]
+
+    def _compute(self):
+        size, weights = self.size, self.weights
+        neighbors = [[cell for _, cell in moves] for moves in getMoveTable(self.rows, self.cols)]
+        table = bytearray([UNSEEN]) * (size ** len(self.tiles))
+        goal = sum(tile * weight for tile, weight in zip(self.tiles, weights))
+        table[goal] = 0
+        frontier = [goal]
+        depth = 0
+        while frontier:
+            depth += 1
+            nextFrontier = []
+            for index in frontier:
+                positions = [index // weight % size for weight in weights]
+                for weight, position in zip(weights, positions):
+                    for cell in neighbors[position]:
+                        if cell in positions:
+                            continue
+                        nextIndex = index + (cell - position) * weight
+                        if table[nextIndex] == UNSEEN:
+                            table[nextIndex] = depth
+                            nextFrontier.append(nextIndex)
+            frontier = nextFrontier
+        return table
+
+def patternDatabaseHeuristic(state, problem=None):
+    """
+    The sum of the disjoint pattern databases for the shape of the puzzle.
+    Admissible and consistent, for use with aStarSearch or
+    iterativeDeepeningAStar.
+    """
+    positions = state.getTilePositions()
+    return sum(database.getValue(positions) for database in getPatternDatabases(state.rows, state.cols))
+
 EIGHT_PUZZLE_DATA = [[1, 0, 2, 3, 4, 5, 6, 7, 8],
                      [1, 7, 8, 2, 3, 4, 5, 6, 0],
                      [4, 3, 2, 7, 0, 5, 1, 6, 8],
@@ -248,18 +380,18 @@ def loadEightPuzzle(puzzleNumber):
     """
     return EightPuzzleState(EIGHT_PUZZLE_DATA[puzzleNumber])
 
-def createRandomEightPuzzle(moves=100):
+def createRandomEightPuzzle(moves=100, rows=3, cols=3):
     """
       moves: number of random moves to apply
 
-      Creates a random eight puzzle by applying
+      Creates a random rows x cols puzzle by applying
       a series of 'moves' random moves to a solved
       puzzle.
     """
-    puzzle = EightPuzzleState([0,1,2,3,4,5,6,7,8])
+    puzzle = EightPuzzleState(range(rows * cols), rows, cols)
     for i in range(moves):
         # Execute a random legal move
-        puzzle = puzzle.result(random.sample(puzzle.legalMoves(), 1)[0])
+        puzzle = puzzle.result(random.choice(puzzle.legalMoves()))
     return puzzle
 
 if __name__ == '__main__':
@@ -268,8 +400,8 @@ if __name__ == '__main__':
     print(puzzle)
 
     problem = EightPuzzleSearchProblem(puzzle)
-    path = search.breadthFirstSearch(problem)
-    print('BFS found a path of %d moves: %s' % (len(path), str(path)))
+    path = search.aStarSearch(problem, patternDatabaseHeuristic)
+    print('A* found a path of %d moves: %s' % (len(path), str(path)))
     curr = puzzle
     i = 1
     for a in path:
@@ -17,6 +17,10 @@ In search.py, you will implement generic search algorithms which are called by
 Pacman agents (in searchAgents.py).
 """
 
+import collections
+import heapq
+import json
+import time
 import util
 
 class SearchProblem:
@@ -61,6 +65,24 @@ class SearchProblem:
         """
         util.raiseNotDefined()
 
+    def getGoalState(self):
+        """
+        Returns the single goal state of the problem.  Only needed by searches
+        that work backwards from the goal, such as bidirectionalSearch.
+        """
+        util.raiseNotDefined()
+
+    def getPredecessors(self, state):
+        """
+          state: Search state
+
+        The reverse of getSuccessors: returns a list of triples (predecessor,
+        action, stepCost), where 'action' leads from 'predecessor' to 'state'
+        and 'stepCost' is the cost of taking it.  Only needed by searches that
+        work backwards from the goal, such as bidirectionalSearch.
+        """
+        util.raiseNotDefined()
+
 
 def tinyMazeSearch(problem):
     """
@@ -72,7 +94,156 @@ def tinyMazeSearch(problem):
     w = Directions.WEST
     return  [s, s, w, s, w, w, s, w]
 
-def depthFirstSearch(problem: SearchProblem):
+class SearchStats:
+    """
+    Counters and timings collected by a search when passed as its stats
+    argument.  Expansions are counted around getSuccessors, so the numbers
+    are comparable across algorithms; a state expanded more than once is
+    also counted as reopened.
+    """
+    def __init__(self):
+        self.searches = 0
+        self.expanded = 0
+        self.generated = 0
+        self.reopened = 0
+        self.maxFrontier = 0
+        self.maxClosed = 0
+        self.heuristicCalls = 0
+        self.heuristicTime = 0.0
+        self.successorTime = 0.0
+        self.searchTime = None
+        self.pathCost = None
+        self.heuristicCache = None
+        self.strategies = None
+        self.startTime = time.time()
+
+    def successorFunction(self, getSuccessors):
+        "Wraps a getSuccessors-like function to count and time expansions."
+        self.searches += 1
+        expandedStates = set()
+        def successors(state):
+            if state in expandedStates:
+                self.reopened += 1
+            else:
+                expandedStates.add(state)
+            start = time.time()
+            result = getSuccessors(state)
+            self.successorTime += time.time() - start
+            self.expanded += 1
+            self.generated += len(result)
+            return result
+        return successors
+
+    def heuristicFunction(self, heuristic):
+        "Wraps a heuristic to count and time its calls."
+        if isinstance(heuristic, MemoizedHeuristic):
+            self.heuristicCache = heuristic
+        def timedHeuristic(state, problem=None):
+            start = time.time()
+            value = heuristic(state, problem)
+            self.heuristicTime += time.time() - start
+            self.heuristicCalls += 1
+            return value
+        return timedHeuristic
+
+    def observe(self, frontierSize, closedSize):
+        "Records the current frontier and closed set sizes."
+        if frontierSize > self.maxFrontier:
+            self.maxFrontier = frontierSize
+        if closedSize > self.maxClosed:
+            self.maxClosed = closedSize
+
+    def finish(self, pathCost=None):
+        "Stops the clock that started when these stats were created."
+        self.searchTime = time.time() - self.startTime
+        self.pathCost = pathCost
+
+    def asDict(self):
+        stats = {
+            'expanded': self.expanded,
+            'generated': self.generated,
+            'reopened': self.reopened,
+            'maxFrontier': self.maxFrontier,
+            'maxClosed': self.maxClosed,
+            'heuristicCalls': self.heuristicCalls,
+            'heuristicTime': round(self.heuristicTime, 6),
+            'successorTime': round(self.successorTime, 6),
+            'searchTime': None if self.searchTime is None else round(self.searchTime, 6),
+            'pathCost': self.pathCost,
+        }
+        if self.heuristicCache is not None:
+            stats['heuristicCacheHits'] = self.heuristicCache.hits
+            stats['heuristicCacheMisses'] = self.heuristicCache.misses
+        if self.strategies is not None:
+            stats['strategies'] = self.strategies
+        return stats
+
+    def __str__(self):
+        return json.dumps(self.asDict(), sort_keys=True)
+
+class SearchNode:
+    """
+    A node in the search tree.  Rather than carrying a copy of the whole action
+    list, each node points back to the node it was generated from, so pushing a
+    successor is O(1) and the path is only rebuilt once a goal is reached.
+    """
+    __slots__ = ('state', 'action', 'cost', 'parent')
+
+    def __init__(self, state, action=None, cost=0, parent=None):
+        self.state = state
+        self.action = action
+        self.cost = cost
+        self.parent = parent
+
+    def path(self):
+        "Returns the list of actions leading from the root to this node."
+        actions = []
+        node = self
+        while node.parent is not None:
+            actions.append(node.action)
+            node = node.parent
+        actions.reverse()
+        return actions
+
+def graphSearch(problem: SearchProblem, fringe, priorityFn=None, stats=None):
+    """
+    Generic graph search shared by dfs, bfs, ucs and A*.
+
+    The fringe decides the expansion order (util.Stack, util.Queue or
+    util.PriorityQueue).  If priorityFn is given, it maps a SearchNode to the
+    priority used when pushing onto a priority queue.  States are goal-tested
+    when popped and closed in a hashed set, so search states must be hashable.
+    """
+    def push(node):
+        if priorityFn is None:
+            fringe.push(node)
+        else:
+            fringe.push(node, priorityFn(node))
+
+    getSuccessors = problem.getSuccessors
+    if stats is not None:
+        getSuccessors = stats.successorFunction(getSuccessors)
+    closed = set()
+    push(SearchNode(problem.getStartState()))
+    frontierSize = 1
+    while not fringe.isEmpty():
+        if stats is not None:
+            stats.observe(frontierSize, len(closed))
+        node = fringe.pop()
+        frontierSize -= 1
+        state = node.state
+        if problem.isGoalState(state):
+            return node.path()
+        if state in closed:
+            continue
+        closed.add(state)
+        for successor, action, stepCost in getSuccessors(state):
+            if successor not in closed:
+                push(SearchNode(successor, action, node.cost + stepCost, node))
+                frontierSize += 1
+    return []
+
+def depthFirstSearch(problem: SearchProblem, stats=None):
     """
     Search the deepest nodes in the search tree first.
 
@@ -87,90 +258,17 @@ def depthFirstSearch(problem: SearchProblem):
     print("Start's successors:", problem.getSuccessors(problem.getStartState()))
     """
     "*** YOUR CODE HERE ***"
-    steps = []
-    expanded = []
-    ##create a new stack
-    fringe = util.Stack()
-    ##get the starting State and new step list
-    start = (problem.getStartState(), [])
-
-    ##add the starting point into the stack
-    fringe.push(start)
-    while not fringe.isEmpty():
-        (state, path) = fringe.pop()
-        if problem.isGoalState(state):
-            steps = path
-            break
-
-        if state not in expanded:
-            expanded.append(state)
-            for successor in problem.getSuccessors(state):
-                newPath = path + [successor[1]]
-                newState = (successor[0], newPath)
-                fringe.push(newState)
-    
-
-    return steps
-    util.raiseNotDefined()
+    return graphSearch(problem, util.Stack(), stats=stats)
 
-def breadthFirstSearch(problem: SearchProblem):
+def breadthFirstSearch(problem: SearchProblem, stats=None):
     """Search the shallowest nodes in the search tree first."""
     "*** YOUR CODE HERE ***"
+    return graphSearch(problem, util.Queue(), stats=stats)
 
-    steps = []
-    expanded = []
-    fringe = util.Queue()
-
-    ##get the starting State and new step list
-    start = (problem.getStartState(), [])
-
-    ##add the starting point into the queue
-    fringe.push(start)
-    while not fringe.isEmpty():
-        (state, path) = fringe.pop()
-        if problem.isGoalState(state):
-            steps = path
-            break
-
-        if state not in expanded:
-            expanded.append(state)
-            for successor in problem.getSuccessors(state):
-                newPath = path + [successor[1]]
-                newState = (successor[0], newPath)
-                fringe.push(newState)
-    
-    return steps
-
-    util.raiseNotDefined()
-
-def uniformCostSearch(problem: SearchProblem):
+def uniformCostSearch(problem: SearchProblem, stats=None):
     """Search the node of least total cost first."""
     "*** YOUR CODE HERE ***"
-    steps = []
-    expanded = []
-    fringe = util.PriorityQueue()
-
-    ##get the starting State and new step list
-    start = (problem.getStartState(), [], 0)
-
-    ##add the starting point into the queue
-    fringe.push(start, 0)
-    while not fringe.isEmpty():
-        (state, path, cost) = fringe.pop()
-        if problem.isGoalState(state):
-            steps = path
-            break
-
-        if state not in expanded:
-            expanded.append(state)
-            for successor in problem.getSuccessors(state):
-                newPath = path + [successor[1]]
-                newCost = cost + successor[2]
-                newState = (successor[0], newPath, newCost)
-                fringe.push(newState, newCost)
-    
-    return steps
-    util.raiseNotDefined()
+    return graphSearch(problem, util.PriorityQueue(), lambda node: node.cost, stats)
 
 def nullHeuristic(state, problem=None):
     """
@@ -179,36 +277,548 @@ def nullHeuristic(state, problem=None):
     """
     return 0
 
-def aStarSearch(problem: SearchProblem, heuristic=nullHeuristic):
+class MemoizedHeuristic:
+    """
+    Wraps a heuristic with a cache of its values keyed on the (hashable) state.
+    A* pushes a state again each time it finds a cheaper path to it, so an
+    expensive heuristic is otherwise recomputed for states it already scored.
+
+    At most maxSize values are kept, evicting the least recently used; None
+    keeps them all.  The cache and its hit/miss counters start over whenever
+    the heuristic is called with a different problem.
+    """
+    def __init__(self, heuristic, maxSize=100000):
+        self.heuristic = heuristic
+        self.maxSize = maxSize
+        self.cache = collections.OrderedDict()
+        self.problem = None
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, state, problem=None):
+        if problem is not self.problem:
+            self.cache.clear()
+            self.problem = problem
+            self.hits = self.misses = 0
+        cache = self.cache
+        if state in cache:
+            self.hits += 1
+            cache.move_to_end(state)
+            return cache[state]
+        self.misses += 1
+        value = self.heuristic(state, problem)
+        cache[state] = value
+        if self.maxSize is not None and len(cache) > self.maxSize:
+            cache.popitem(last=False)
+        return value
+
+def aStarSearch(problem: SearchProblem, heuristic=nullHeuristic, stats=None):
     """Search the node that has the lowest combined cost and heuristic first."""
     "*** YOUR CODE HERE ***"
+    if stats is not None:
+        heuristic = stats.heuristicFunction(heuristic)
+    return graphSearch(problem, util.PriorityQueue(),
+                       lambda node: node.cost + heuristic(node.state, problem), stats)
 
-    steps = []
-    expanded = []
-    fringe = util.PriorityQueue()
-
-    ##get the starting State and new step list
-    start = (problem.getStartState(), [], 0)
+def bidirectionalSearch(problem: SearchProblem, stats=None):
+    """
+    Uniform cost search run from the start and from the goal at the same time,
+    stopping once the two searches provably cannot improve on the best meeting
+    point found so far.  On problems with a single goal and reversible moves
+    this expands roughly the square root of the nodes a one-sided search does.
 
-    ##add the starting point into the queue
-    fringe.push(start, 0)
-    while not fringe.isEmpty():
-        (state, path, cost) = fringe.pop()
-        if problem.isGoalState(state):
-            steps = path
+    The problem must implement getGoalState and getPredecessors.
+    """
+    start, goal = problem.getStartState(), problem.getGoalState()
+    if start == goal:
+        return []
+    # Each side keeps its best-known costs, a parent map of (neighbor, action)
+    # pairs pointing back towards its root, a closed set and a heap fringe.
+    sides = []
+    for root, expand in ((start, problem.getSuccessors), (goal, problem.getPredecessors)):
+        if stats is not None:
+            expand = stats.successorFunction(expand)
+        sides.append({'cost': {root: 0}, 'parent': {root: None}, 'closed': set(),
+                      'fringe': [(0, 0, root)], 'expand': expand})
+    forward, backward = sides
+    best, meeting, count = float('inf'), None, 1
+    while forward['fringe'] and backward['fringe']:
+        if forward['fringe'][0][0] + backward['fringe'][0][0] >= best:
             break
+        if stats is not None:
+            stats.observe(len(forward['fringe']) + len(backward['fringe']),
+                          len(forward['closed']) + len(backward['closed']))
+        if len(forward['fringe']) <= len(backward['fringe']):
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+        cost, _, state = heapq.heappop(side['fringe'])
+        if state in side['closed']:
+            continue
+        side['closed'].add(state)
+        for neighbor, action, stepCost in side['expand'](state):
+            newCost = cost + stepCost
+            if newCost < side['cost'].get(neighbor, float('inf')):
+                side['cost'][neighbor] = newCost
+                side['parent'][neighbor] = (state, action)
+                heapq.heappush(side['fringe'], (newCost, count, neighbor))
+                count += 1
+            if neighbor in other['cost'] and side['cost'][neighbor] + other['cost'][neighbor] < best:
+                best = side['cost'][neighbor] + other['cost'][neighbor]
+                meeting = neighbor
+    if meeting is None:
+        return []
+
+    actions = []
+    state = meeting
+    while forward['parent'][state] is not None:
+        state, action = forward['parent'][state]
+        actions.append(action)
+    actions.reverse()
+    state = meeting
+    while backward['parent'][state] is not None:
+        state, action = backward['parent'][state]
+        actions.append(action)
+    return actions
+
+def iterativeDeepeningAStar(problem: SearchProblem, heuristic=nullHeuristic, stats=None):
+    """
+    Depth-first searches bounded by f = g + h, raising the bound to the
+    smallest f that exceeded it until a goal is found.  Memory use is linear
+    in the solution depth; states are only checked for cycles along the
+    current path, so the same state may be expanded many times.
+    """
+    getSuccessors = problem.getSuccessors
+    if stats is not None:
+        getSuccessors = stats.successorFunction(getSuccessors)
+        heuristic = stats.heuristicFunction(heuristic)
+    start = problem.getStartState()
+    bound = heuristic(start, problem)
+    while bound != float('inf'):
+        actions, bound = _boundedDepthFirst(problem, heuristic, start, bound, getSuccessors, stats)
+        if actions is not None:
+            return actions
+    return []
+
+def _boundedDepthFirst(problem, heuristic, start, bound, getSuccessors, stats):
+    """
+    One iteration of IDA*.  Returns (actions, bound) with the actions to a goal
+    of cost at most bound, or (None, nextBound) with the smallest f seen above
+    the bound.
+    """
+    if problem.isGoalState(start):
+        return [], bound
+    nextBound = float('inf')
+    actions = []
+    onPath = set([start])
+    stack = [(start, 0, iter(getSuccessors(start)))]
+    while stack:
+        if stats is not None:
+            stats.observe(len(stack), len(onPath))
+        state, cost, successors = stack[-1]
+        for successor, action, stepCost in successors:
+            if successor in onPath:
+                continue
+            successorCost = cost + stepCost
+            f = successorCost + heuristic(successor, problem)
+            if f > bound:
+                nextBound = min(nextBound, f)
+                continue
+            actions.append(action)
+            if problem.isGoalState(successor):
+                return actions, bound
+            onPath.add(successor)
+            stack.append((successor, successorCost, iter(getSuccessors(successor))))
+            break
+        else:
+            stack.pop()
+            onPath.discard(state)
+            if stack:
+                actions.pop()
+    return None, nextBound
+
+class _SMANode:
+    "A node of the partial search tree kept in memory by smaStar."
+    __slots__ = ('state', 'action', 'cost', 'parent', 'index', 'depth', 'f',
+                 'successors', 'nextIndex', 'children', 'forgotten', 'inQueue', 'version')
+
+    def __init__(self, state, action, cost, parent, index, f):
+        self.state = state
+        self.action = action
+        self.cost = cost
+        self.parent = parent
+        self.index = index
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.f = f
+        self.successors = None
+        self.nextIndex = 0
+        self.children = {}
+        self.forgotten = {}
+        self.inQueue = False
+        self.version = 0
+
+    def path(self):
+        return SearchNode.path(self)
+
+    def onPath(self, state):
+        node = self
+        while node is not None:
+            if node.state == state:
+                return True
+            node = node.parent
+        return False
+
+def smaStar(problem: SearchProblem, heuristic=nullHeuristic, maxNodes=10000, stats=None):
+    """
+    Simplified memory-bounded A*: behaves like A* until maxNodes search nodes
+    are in memory, then forgets the shallowest leaf of highest f, remembering
+    its f in the parent so the subtree is only regenerated once every better
+    alternative has been ruled out.
+
+    Returns an optimal path if one of at most maxNodes - 1 steps exists, and
+    the best path that fits in memory otherwise.  Every (re)expansion calls
+    getSuccessors, so the problem's expansion counter reflects regeneration.
+    """
+    if maxNodes < 2:
+        raise ValueError('smaStar needs room for at least two nodes')
+    getSuccessors = problem.getSuccessors
+    if stats is not None:
+        getSuccessors = stats.successorFunction(getSuccessors)
+        heuristic = stats.heuristicFunction(heuristic)
+    inf = float('inf')
+    best, worst = [], []
+    counter = [0]
+
+    def enqueue(node):
+        node.inQueue = True
+        node.version += 1
+        counter[0] += 1
+        heapq.heappush(best, (node.f, -node.depth, counter[0], node.version, node))
+        if not node.children:
+            heapq.heappush(worst, (-node.f, node.depth, counter[0], node.version, node))
+
+    def setF(node, f):
+        node.f = f
+        if node.inQueue:
+            enqueue(node)
+
+    def backUp(node):
+        "Raises f along the ancestors of a fully generated node to the best child f."
+        while node is not None and node.nextIndex == len(node.successors):
+            f = min([child.f for child in node.children.values()] +
+                     list(node.forgotten.values()) + [inf])
+            if f == node.f:
+                break
+            setF(node, f)
+            node = node.parent
+
+    def forgetWorstLeaf(keep):
+        "Forgets the shallowest highest-f leaf other than keep and the root."
+        skipped, victim = [], None
+        while worst and victim is None:
+            entry = heapq.heappop(worst)
+            node = entry[-1]
+            if not node.inQueue or entry[3] != node.version or node.children:
+                continue
+            if node is keep or node.parent is None:
+                skipped.append(entry)
+            else:
+                victim = node
+        for entry in skipped:
+            heapq.heappush(worst, entry)
+        if victim is None:
+            return False
+        victim.inQueue = False
+        parent = victim.parent
+        del parent.children[victim.index]
+        parent.forgotten[victim.index] = victim.f
+        if not parent.inQueue or not parent.children:
+            enqueue(parent)
+        return True
+
+    start = problem.getStartState()
+    root = _SMANode(start, None, 0, None, None, heuristic(start, problem))
+    enqueue(root)
+    used = 1
+    while best:
+        _, _, _, version, node = best[0]
+        if not node.inQueue or version != node.version:
+            heapq.heappop(best)
+            continue
+        if node.f == inf:
+            break
+        if stats is not None:
+            stats.observe(used, 0)
+        if problem.isGoalState(node.state):
+            return node.path()
+
+        if node.successors is None:
+            node.successors = [s for s in getSuccessors(node.state)
+                               if not node.onPath(s[0])]
+        if node.nextIndex < len(node.successors):
+            index = node.nextIndex
+            node.nextIndex += 1
+            successor, action, stepCost = node.successors[index]
+            cost = node.cost + stepCost
+            f = max(node.f, cost + heuristic(successor, problem))
+        elif node.forgotten:
+            index = min(node.forgotten, key=node.forgotten.get)
+            successor, action, stepCost = node.successors[index]
+            cost = node.cost + stepCost
+            f = max(node.f, node.forgotten.pop(index))
+        else:
+            # A dead end: its f becomes infinite and it is the first to go.
+            backUp(node)
+            continue
+
+        child = _SMANode(successor, action, cost, node, index, f)
+        if child.depth >= maxNodes - 1 and not problem.isGoalState(successor):
+            child.f = inf
+        node.children[index] = child
+        if node.nextIndex == len(node.successors):
+            backUp(node)
+        if node.nextIndex == len(node.successors) and not node.forgotten:
+            node.inQueue = False
+        used += 1
+        while used > maxNodes and forgetWorstLeaf(child):
+            used -= 1
+        enqueue(child)
+    return []
+
+class DStarLite:
+    """
+    Incremental shortest paths from a moving start to a changing set of goals
+    (D* Lite, Koenig and Likhachev 2002).
+
+    The search runs backwards from the goals, so the g values it keeps are
+    distances to the nearest goal.  When the start moves or goals are added
+    or removed, only the states whose distance changed are updated, instead
+    of searching again from scratch.
 
-        if state not in expanded:
-            expanded.append(state)
-            for successor in problem.getSuccessors(state):
-                newPath = path + [successor[1]]
-                newCost =  cost + successor[2] 
-                newState = (successor[0], newPath, newCost)
-                fringe.push(newState, newCost + heuristic(successor[0], problem))
-    
-    return steps
-    
-    util.raiseNotDefined()
+    The problem must implement getPredecessors as well as getSuccessors;
+    both are called at most once per state.  heuristic(state, start) must be
+    a consistent estimate of the cost between two states.
+    """
+    def __init__(self, problem, goals, heuristic=lambda state, start: 0):
+        self.problem = problem
+        self.heuristic = heuristic
+        self.start = self.lastStart = problem.getStartState()
+        self.goals = set(goals)
+        self.g = {}
+        self.rhs = {}
+        self.km = 0
+        self.queue = []
+        self.queued = {}
+        self._successors = {}
+        self._predecessors = {}
+        for goal in self.goals:
+            self.rhs[goal] = 0
+            self._push(goal)
+
+    def getSuccessors(self, state):
+        if state not in self._successors:
+            self._successors[state] = self.problem.getSuccessors(state)
+        return self._successors[state]
+
+    def getPredecessors(self, state):
+        if state not in self._predecessors:
+            self._predecessors[state] = self.problem.getPredecessors(state)
+        return self._predecessors[state]
+
+    def moveStart(self, start):
+        "Moves the start, which the costs of queued states are estimated from."
+        self.km += self.heuristic(self.lastStart, start)
+        self.start = self.lastStart = start
+
+    def setGoals(self, goals):
+        "Replaces the goal set, updating only the states whose goal changed."
+        goals = set(goals)
+        changed = self.goals.symmetric_difference(goals)
+        self.goals = goals
+        for state in changed:
+            self._updateState(state)
+
+    def removeGoal(self, goal):
+        if goal in self.goals:
+            self.goals.discard(goal)
+            self._updateState(goal)
+
+    def getPath(self):
+        """
+        Returns the actions of a shortest path from the start to the nearest
+        goal, or [] if no goal can be reached.
+        """
+        self._computeShortestPath()
+        inf = float('inf')
+        state = self.start
+        if self.g.get(state, inf) == inf:
+            return []
+        actions = []
+        while state not in self.goals:
+            best, bestAction, bestCost = None, None, inf
+            for successor, action, stepCost in self.getSuccessors(state):
+                cost = stepCost + self.g.get(successor, inf)
+                if cost < bestCost:
+                    best, bestAction, bestCost = successor, action, cost
+            actions.append(bestAction)
+            state = best
+        return actions
+
+    def _key(self, state):
+        inf = float('inf')
+        value = min(self.g.get(state, inf), self.rhs.get(state, inf))
+        return (value + self.heuristic(state, self.start) + self.km, value)
+
+    def _push(self, state):
+        key = self._key(state)
+        self.queued[state] = key
+        heapq.heappush(self.queue, (key, state))
+
+    def _topKey(self):
+        queue, queued = self.queue, self.queued
+        while queue and queued.get(queue[0][1]) != queue[0][0]:
+            heapq.heappop(queue)
+        if queue:
+            return queue[0][0]
+        return (float('inf'), float('inf'))
+
+    def _updateState(self, state):
+        inf = float('inf')
+        if state in self.goals:
+            self.rhs[state] = 0
+        else:
+            rhs = inf
+            for successor, action, stepCost in self.getSuccessors(state):
+                rhs = min(rhs, stepCost + self.g.get(successor, inf))
+            self.rhs[state] = rhs
+        self.queued.pop(state, None)
+        if self.g.get(state, inf) != self.rhs[state]:
+            self._push(state)
+
+    def _computeShortestPath(self):
+        inf = float('inf')
+        g, rhs = self.g, self.rhs
+        while self._topKey() < self._key(self.start) or \
+                rhs.get(self.start, inf) != g.get(self.start, inf):
+            oldKey, state = heapq.heappop(self.queue)
+            del self.queued[state]
+            newKey = self._key(state)
+            if oldKey < newKey:
+                self._push(state)
+            elif g.get(state, inf) > rhs[state]:
+                g[state] = rhs[state]
+                for predecessor, action, stepCost in self.getPredecessors(state):
+                    self._updateState(predecessor)
+            else:
+                g[state] = inf
+                self._updateState(state)
+                for predecessor, action, stepCost in self.getPredecessors(state):
+                    self._updateState(predecessor)
+
+def portfolioSearch(problem: SearchProblem, heuristic=nullHeuristic, strategies=None, timeout=None, stats=None):
+    """
+    Runs several search strategies on the problem at once, each in its own
+    process with its own copy of the problem, and returns the plan of the
+    first optimal strategy to finish.  The other strategies are then stopped.
+
+    strategies is a list of (name, searchFunction, optimal) triples, where
+    searchFunction(problem, stats=stats) returns a list of actions; by default
+    A* and greedy search with the heuristic, and uniform cost search.  If no
+    optimal strategy has finished after timeout seconds, the cheapest plan
+    found so far is returned instead (or the next one to finish).
+
+    Worker processes are forked so that problems holding lambdas or game
+    states need not be picklable.  If stats is given, it takes the counters
+    of the winning strategy, and stats.strategies reports every strategy.
+    """
+    import concurrent.futures
+    import functools
+    import multiprocessing
+    if strategies is None:
+        strategies = [('astar', functools.partial(aStarSearch, heuristic=heuristic), True),
+                      ('ucs', uniformCostSearch, True),
+                      ('greedy', functools.partial(greedySearch, heuristic=heuristic), False)]
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    executor = concurrent.futures.ProcessPoolExecutor(
+        len(strategies), context, _initPortfolioWorker, (problem, strategies))
+    reports = [{'name': name, 'optimal': optimal, 'status': 'cancelled'}
+               for name, searchFunction, optimal in strategies]
+    start = time.time()
+    best = None
+    try:
+        pending = set(executor.submit(_runPortfolioStrategy, i) for i in range(len(strategies)))
+        while pending:
+            # Wait for the next strategy until the deadline, and past it for
+            # the first plan if none has come back yet
+            wait = None
+            if timeout is not None:
+                remaining = start + timeout - time.time()
+                if remaining > 0:
+                    wait = remaining
+            done, pending = concurrent.futures.wait(
+                pending, wait, concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index, actions, cost, searchStats = future.result()
+                reports[index].update(status='finished', cost=cost, time=round(time.time() - start, 6),
+                                      stats=searchStats)
+                if actions and (best is None or cost < best[2] or
+                                (cost == best[2] and strategies[index][2])):
+                    best = (index, actions, cost, searchStats)
+            if best is not None and strategies[best[0]][2]:
+                break
+            if timeout is not None and best is not None and time.time() >= start + timeout:
+                break
+    finally:
+        _stopExecutor(executor)
+
+    if best is None:
+        return []
+    index, actions, cost, searchStats = best
+    reports[index]['status'] = 'won'
+    if '_expanded' in dir(problem):
+        problem._expanded = searchStats['expanded']
+    if stats is not None:
+        stats.searches += 1
+        for name, value in searchStats.items():
+            if name not in ('searchTime', 'pathCost', 'heuristicCacheHits', 'heuristicCacheMisses'):
+                setattr(stats, name, value)
+        stats.strategies = reports
+    return actions
+
+def greedySearch(problem: SearchProblem, heuristic=nullHeuristic, stats=None):
+    """Search the node that has the lowest heuristic first."""
+    if stats is not None:
+        heuristic = stats.heuristicFunction(heuristic)
+    return graphSearch(problem, util.PriorityQueue(),
+                       lambda node: heuristic(node.state, problem), stats)
+
+def _initPortfolioWorker(problem, strategies):
+    global _portfolio
+    # Only the parent process may draw on the display
+    if 'visualize' in dir(problem):
+        problem.visualize = False
+    _portfolio = (problem, strategies)
+
+def _runPortfolioStrategy(index):
+    problem, strategies = _portfolio
+    name, searchFunction, optimal = strategies[index]
+    stats = SearchStats()
+    actions = searchFunction(problem, stats=stats)
+    cost = problem.getCostOfActions(actions) if actions else None
+    stats.finish(cost)
+    return index, actions, cost, stats.asDict()
+
+def _stopExecutor(executor):
+    "Shuts down a ProcessPoolExecutor without waiting for tasks that are still running."
+    # There is no public way to interrupt a running task before Python 3.14
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
 
 
 # Abbreviations
@@ -216,3 +826,8 @@ bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+bidirectional = bidirectionalSearch
+idastar = iterativeDeepeningAStar
+smastar = smaStar
+greedy = greedySearch
+portfolio = portfolioSearch
@@ -39,10 +39,12 @@ from typing import List, Tuple, Any
 from game import Directions
 from game import Agent
 from game import Actions
+from game import Grid
 import util
 import time
 import search
 import pacman
+import distanceOracle
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -71,21 +73,31 @@ class SearchAgent(Agent):
     Options for fn include:
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
+      bidirectionalSearch or bidirectional (PositionSearchProblem only)
+      portfolioSearch or portfolio (runs several strategies in parallel)
+
+    Passing cacheSize memoizes the heuristic, keeping the values of the
+    cacheSize most recently scored states.
 
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', cacheSize=None):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
         # Get the search function from the name and heuristic
         if fn not in dir(search):
             raise AttributeError(fn + ' is not a search function in search.py.')
         func = getattr(search, fn)
+        self.searchStats = None
+        collectsStats = 'stats' in func.__code__.co_varnames
         if 'heuristic' not in func.__code__.co_varnames:
             print('[SearchAgent] using function ' + fn)
-            self.searchFunction = func
+            if collectsStats:
+                self.searchFunction = lambda x: func(x, stats=self.searchStats)
+            else:
+                self.searchFunction = func
         else:
             if heuristic in globals().keys():
                 heur = globals()[heuristic]
@@ -93,9 +105,14 @@ class SearchAgent(Agent):
                 heur = getattr(search, heuristic)
             else:
                 raise AttributeError(heuristic + ' is not a function in searchAgents.py or search.py.')
+            if cacheSize is not None:
+                heur = search.MemoizedHeuristic(heur, int(cacheSize))
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            if collectsStats:
+                self.searchFunction = lambda x: func(x, heuristic=heur, stats=self.searchStats)
+            else:
+                self.searchFunction = lambda x: func(x, heuristic=heur)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -115,12 +132,17 @@ class SearchAgent(Agent):
         if self.searchFunction == None: raise Exception("No search function provided for SearchAgent")
         starttime = time.time()
         problem = self.searchType(state) # Makes a new search problem
+        self.searchStats = search.SearchStats()
         self.actions  = self.searchFunction(problem) # Find a path
         if self.actions == None:
             self.actions = []
+        if 'expandActions' in dir(problem): self.actions = problem.expandActions(self.actions)
         totalCost = problem.getCostOfActions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        if self.searchStats.searches:
+            self.searchStats.finish(totalCost)
+            print('Search stats: %s' % self.searchStats)
 
     def getAction(self, state):
         """
@@ -148,15 +170,19 @@ class PositionSearchProblem(search.SearchProblem):
 
     Note: this search problem is fully specified; you should NOT change it.
     """
+    jump = False
 
-    def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True):
+    def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True, jump=False):
         """
         Stores the start and goal.
 
         gameState: A GameState object (pacman.py)
         costFn: A function from a search state (tuple) to a non-negative number
         goal: A position in the gameState
+        jump: use jump point search successors (see getJumpSuccessors)
         """
+        self.jump = jump
+        self._jumpArrivals = {}
         self.walls = gameState.getWalls()
         self.startState = gameState.getPacmanPosition()
         if start != None: self.startState = start
@@ -196,6 +222,8 @@ class PositionSearchProblem(search.SearchProblem):
          required to get there, and 'stepCost' is the incremental
          cost of expanding to that successor
         """
+        if self.jump:
+            return self.getJumpSuccessors(state)
 
         successors = []
         for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
@@ -215,12 +243,129 @@ class PositionSearchProblem(search.SearchProblem):
 
         return successors
 
+    def getJumpSuccessors(self, state):
+        """
+        Jump point search successors: instead of single steps, returns the
+        next jump points reachable in a straight line, with the tuple of
+        primitive actions that gets there as the action.
+
+        Shortest paths are only followed in a canonical order, turning from a
+        horizontal run into a vertical one only where a wall forces it, so
+        runs through open areas collapse into a single macro-step.  This is
+        only optimal when every move costs the same.  The directions a state
+        was reached from are remembered, since they decide which of its
+        neighbors are worth trying.
+        """
+        successors = []
+        for action in self._jumpDirections(state):
+            jump = self._jump(state, action, True)
+            if jump is not None:
+                nextState, steps, cost = jump
+                self._jumpArrivals.setdefault(nextState, set()).add(action)
+                successors.append( ( nextState, (action,) * steps, cost) )
+
+        # Bookkeeping for display purposes
+        self._expanded += 1 # DO NOT CHANGE
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return successors
+
+    def _jumpDirections(self, state):
+        "The directions worth jumping in, given how state was reached."
+        arrivals = self._jumpArrivals.get(state)
+        if not arrivals:
+            return [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+        x, y = state
+        walls = self.walls
+        directions = set()
+        for arrival in arrivals:
+            directions.add(arrival)
+            if arrival in (Directions.EAST, Directions.WEST):
+                dx = int(Actions.directionToVector(arrival)[0])
+                if not walls[x][y + 1] and walls[x - dx][y + 1]:
+                    directions.add(Directions.NORTH)
+                if not walls[x][y - 1] and walls[x - dx][y - 1]:
+                    directions.add(Directions.SOUTH)
+            else:
+                directions.add(Directions.EAST)
+                directions.add(Directions.WEST)
+        return [d for d in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST] if d in directions]
+
+    def _jump(self, state, action, branch):
+        """
+        Moves from state in a straight line until reaching a jump point, and
+        returns (jumpPoint, steps, cost), or None if a wall comes first.  A
+        vertical run stops where a horizontal run would find a jump point;
+        branch is False for the horizontal runs used to check that.
+        """
+        walls = self.walls
+        dx, dy = Actions.directionToVector(action)
+        dx, dy = int(dx), int(dy)
+        x, y = state
+        steps, cost = 0, 0
+        while True:
+            x, y = x + dx, y + dy
+            if walls[x][y]:
+                return None
+            steps += 1
+            cost += self.costFn((x, y))
+            if self.isGoalState((x, y)):
+                return (x, y), steps, cost
+            if dx != 0:
+                if (not walls[x][y + 1] and walls[x - dx][y + 1]) or \
+                   (not walls[x][y - 1] and walls[x - dx][y - 1]):
+                    return (x, y), steps, cost
+            elif branch:
+                if self._jump((x, y), Directions.EAST, False) is not None or \
+                   self._jump((x, y), Directions.WEST, False) is not None:
+                    return (x, y), steps, cost
+
+    def expandActions(self, actions):
+        "Flattens the macro-steps returned in jump mode into primitive actions."
+        primitive = []
+        for action in actions:
+            if isinstance(action, tuple):
+                primitive.extend(action)
+            else:
+                primitive.append(action)
+        return primitive
+
+    def getGoalState(self):
+        return self.goal
+
+    def getPredecessors(self, state):
+        """
+        Returns the states from which a single move reaches state, the actions
+        that do so, and their cost.  Moves are reversible, so these are found
+        by stepping backwards along each direction vector.
+        """
+
+        predecessors = []
+        cost = self.costFn(state)
+        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+            x,y = state
+            dx, dy = Actions.directionToVector(action)
+            prevx, prevy = int(x - dx), int(y - dy)
+            if not self.walls[prevx][prevy]:
+                predecessors.append( ( (prevx, prevy), action, cost) )
+
+        # Bookkeeping for display purposes
+        self._expanded += 1
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return predecessors
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions. If those actions
         include an illegal move, return 999999.
         """
         if actions == None: return 999999
+        actions = self.expandActions(actions)
         x,y= self.getStartState()
         cost = 0
         for action in actions:
@@ -300,7 +445,7 @@ class CornersProblem(search.SearchProblem):
         space)
         """
         "*** YOUR CODE HERE ***"
-        return [self.startingPosition, self.corners] 
+        return (self.startingPosition, self.corners)
         util.raiseNotDefined()
 
     def isGoalState(self, state: Any):
@@ -387,9 +532,91 @@ def cornersHeuristic(state: Any, problem: CornersProblem):
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
     def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, cornersHeuristic)
+        heuristic = search.MemoizedHeuristic(cornersHeuristic)
+        self.searchFunction = lambda prob: search.aStarSearch(prob, heuristic, stats=self.searchStats)
         self.searchType = CornersProblem
 
+class FoodBitboard:
+    """
+    An immutable set of food positions packed into a single int.  Bit i is set
+    when the i-th open cell of the maze (in walls.asList(False) order) still
+    has food, so eating a dot, hashing and comparing are each a couple of
+    integer operations and successors share everything but that int.
+
+    For heuristics written against game.Grid, asList(), count(), grid[x][y]
+    indexing and asGrid() are all supported.
+    """
+    __slots__ = ('bits', 'cells', 'masks', 'width', 'height', '_grid')
+
+    def __init__(self, bits, cells, masks, width, height):
+        self.bits = bits
+        self.cells = cells
+        self.masks = masks
+        self.width = width
+        self.height = height
+        self._grid = None
+
+    @staticmethod
+    def fromGrid(foodGrid, walls):
+        "Packs a food Grid using the open cells of walls as bit positions."
+        cells = walls.asList(False)
+        masks = dict((cell, 1 << i) for i, cell in enumerate(cells))
+        bits = 0
+        for cell in foodGrid.asList():
+            bits |= masks[cell]
+        return FoodBitboard(bits, cells, masks, foodGrid.width, foodGrid.height)
+
+    def eat(self, position):
+        "Returns the food left after Pacman visits position."
+        mask = self.masks.get(position, 0)
+        if not self.bits & mask:
+            return self
+        return FoodBitboard(self.bits & ~mask, self.cells, self.masks, self.width, self.height)
+
+    def hasFood(self, x, y):
+        return bool(self.bits & self.masks.get((x, y), 0))
+
+    def count(self, item=True):
+        food = bin(self.bits).count('1')
+        if item:
+            return food
+        return self.width * self.height - food
+
+    def asList(self, key=True):
+        if not key:
+            return self.asGrid().asList(False)
+        positions = []
+        bits = self.bits
+        while bits:
+            lowest = bits & -bits
+            positions.append(self.cells[lowest.bit_length() - 1])
+            bits ^= lowest
+        return positions
+
+    def asGrid(self):
+        "Returns (and caches) an equivalent game.Grid.  Do not modify it."
+        if self._grid is None:
+            grid = Grid(self.width, self.height, False)
+            for x, y in self.asList():
+                grid[x][y] = True
+            self._grid = grid
+        return self._grid
+
+    def copy(self):
+        return self
+
+    def __getitem__(self, i):
+        return self.asGrid()[i]
+
+    def __eq__(self, other):
+        return isinstance(other, FoodBitboard) and self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __str__(self):
+        return str(self.asGrid())
+
 class FoodSearchProblem:
     """
     A search problem associated with finding the a path that collects all of the
@@ -397,11 +624,13 @@ class FoodSearchProblem:
 
     A search state in this problem is a tuple ( pacmanPosition, foodGrid ) where
       pacmanPosition: a tuple (x,y) of integers specifying Pacman's position
-      foodGrid:       a Grid (see game.py) of either True or False, specifying remaining food
+      foodGrid:       a FoodBitboard specifying remaining food; it supports
+                      the Grid methods asList(), count() and grid[x][y]
     """
     def __init__(self, startingGameState: pacman.GameState):
-        self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
         self.walls = startingGameState.getWalls()
+        self.start = (startingGameState.getPacmanPosition(),
+                      FoodBitboard.fromGrid(startingGameState.getFood(), self.walls))
         self.startingGameState = startingGameState
         self._expanded = 0 # DO NOT CHANGE
         self.heuristicInfo = {} # A dictionary for the heuristic to store information
@@ -410,7 +639,7 @@ class FoodSearchProblem:
         return self.start
 
     def isGoalState(self, state):
-        return state[1].count() == 0
+        return state[1].bits == 0
 
     def getSuccessors(self, state):
         "Returns successor states, the actions they require, and a cost of 1."
@@ -421,8 +650,7 @@ class FoodSearchProblem:
             dx, dy = Actions.directionToVector(direction)
             nextx, nexty = int(x + dx), int(y + dy)
             if not self.walls[nextx][nexty]:
-                nextFood = state[1].copy()
-                nextFood[nextx][nexty] = False
+                nextFood = state[1].eat((nextx, nexty))
                 successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
         return successors
 
@@ -443,7 +671,8 @@ class FoodSearchProblem:
 class AStarFoodSearchAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
     def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, foodHeuristic)
+        heuristic = search.MemoizedHeuristic(foodHeuristic)
+        self.searchFunction = lambda prob: search.aStarSearch(prob, heuristic, stats=self.searchStats)
         self.searchType = FoodSearchProblem
 
 def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
@@ -459,9 +688,10 @@ def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
     other hand, inadmissible or inconsistent heuristics may find optimal
     solutions, so be careful.
 
-    The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a Grid
-    (see game.py) of either True or False. You can call foodGrid.asList() to get
-    a list of food coordinates instead.
+    The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a
+    FoodBitboard, which can be indexed like a Grid (see game.py) of either True
+    or False. You can call foodGrid.asList() to get a list of food coordinates
+    instead.
 
     If you want access to info like walls, capsules, etc., you can query the
     problem.  For example, problem.walls gives you a Grid of where the walls
@@ -487,12 +717,22 @@ def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
 
 
 class ClosestDotSearchAgent(SearchAgent):
-    "Search for all food using a sequence of searches"
+    """
+    Search for all food using a sequence of searches.
+
+    The searches share one incremental planner (search.DStarLite), so each
+    dot eaten only updates the distances it changed instead of starting a
+    new search from Pacman's new position.
+    """
     def registerInitialState(self, state):
         self.actions = []
         currentState = state
+        problem = AnyFoodSearchProblem(state)
+        planner = search.DStarLite(problem, problem.foodPositions, util.manhattanDistance)
         while(currentState.getFood().count() > 0):
-            nextPathSegment = self.findPathToClosestDot(currentState) # The missing piece
+            nextPathSegment = planner.getPath()
+            if not nextPathSegment:
+                break
             self.actions += nextPathSegment
             for action in nextPathSegment:
                 legal = currentState.getLegalActions()
@@ -500,8 +740,11 @@ class ClosestDotSearchAgent(SearchAgent):
                     t = (str(action), str(currentState))
                     raise Exception('findPathToClosestDot returned an illegal move: %s!\n%s' % t)
                 currentState = currentState.generateSuccessor(0, action)
+                planner.removeGoal(currentState.getPacmanPosition())
+            planner.moveStart(currentState.getPacmanPosition())
         self.actionIndex = 0
         print('Path found with cost %d.' % len(self.actions))
+        print('Search nodes expanded: %d' % problem._expanded)
 
     def findPathToClosestDot(self, gameState: pacman.GameState):
         """
@@ -538,6 +781,7 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         "Stores information from the gameState.  You don't need to change this."
         # Store the food for later reference
         self.food = gameState.getFood()
+        self.foodPositions = set(self.food.asList())
 
         # Store info for the PositionSearchProblem (no need to change this)
         self.walls = gameState.getWalls()
@@ -553,16 +797,16 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         x,y = state
 
         "*** YOUR CODE HERE ***"
-        foodcoors = self.food.asList()
-        return state in foodcoors 
+        return state in self.foodPositions
 
         util.raiseNotDefined()
 
 def mazeDistance(point1: Tuple[int, int], point2: Tuple[int, int], gameState: pacman.GameState) -> int:
     """
-    Returns the maze distance between any two points, using the search functions
-    you have already built. The gameState can be any game state -- Pacman's
-    position in that state is ignored.
+    Returns the maze distance between any two points. Distances come from the
+    all-pairs table in distanceOracle.py, which is built once per layout. The
+    gameState can be any game state -- Pacman's position in that state is
+    ignored.
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
@@ -573,5 +817,8 @@ def mazeDistance(point1: Tuple[int, int], point2: Tuple[int, int], gameState: pa
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    distance = distanceOracle.getDistanceOracle(gameState.data.layout).getDistance(point1, point2)
+    if distance is None:
+        # A search would find no path either, and an empty plan has length 0
+        return 0
+    return distance
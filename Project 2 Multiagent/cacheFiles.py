@@ -0,0 +1,86 @@
+# cacheFiles.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Cache files for tables that are expensive to build, such as all-pairs maze
+distances or pattern databases.
+
+Files live in a directory private to the current user and start with a
+header holding a magic number, the format version and a key naming their
+contents.  A file whose header does not match exactly what the caller asks
+for is ignored, so an old format or a table for something else is never
+mistaken for the right one.
+
+Example:
+path = os.path.join(getCacheDirectory('distances'), name)
+table = loadCacheFile(path, key, size)
+if table is None:
+    table = compute()
+    saveCacheFile(path, key, table)
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+
+CACHE_MAGIC = b'PACCACHE'
+CACHE_VERSION = 1
+
+def getCacheDirectory(name):
+    "The directory for the name cache of the current user, under $XDG_CACHE_HOME or ~/.cache."
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pacman', name)
+
+def cacheHeader(key):
+    "The header of a cache file holding key, padded so the data is 8-byte aligned."
+    keyBytes = key.encode()
+    header = CACHE_MAGIC + struct.pack('<II', CACHE_VERSION, len(keyBytes)) + keyBytes
+    return header + b'\0' * (-len(header) % 8)
+
+def loadCacheFile(path, key, size):
+    """
+    Maps a file written by saveCacheFile into memory and returns a read-only
+    memoryview of its size bytes of data, or None if the file is missing or
+    has another header or size.
+    """
+    header = cacheHeader(key)
+    try:
+        with open(path, 'rb') as f:
+            if size == 0 or os.fstat(f.fileno()).st_size != len(header) + size:
+                return None
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if data[:len(header)] != header:
+        data.close()
+        return None
+    return memoryview(data)[len(header):]
+
+def saveCacheFile(path, key, data):
+    """
+    Writes data to path after the header for key.  The file is written
+    atomically so concurrent processes never see a partial file, and errors
+    are ignored since the cache is only an optimization.
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(cacheHeader(key))
+            f.write(data)
+        os.replace(tmpPath, path)
+    except OSError:
+        pass
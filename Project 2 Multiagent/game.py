@@ -23,6 +23,7 @@
 from util import *
 import time
 import os
+import random
 import traceback
 import sys
 
@@ -299,6 +300,103 @@ def reconstituteGrid(bitRep):
     width, height = bitRep[:2]
     return Grid(width, height, bitRepresentation=bitRep[2:])
 
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class NumpyGrid(Grid):
+    """
+    A boolean Grid stored in a (width, height) numpy array instead of a list of
+    lists.  grid[x][y] indexing works as before (grid[x] is a row view), while
+    count, asList, packBits and hashing are vectorized.  Only boolean grids
+    such as walls and food can use this backend.
+
+    Requires numpy; see useNumpyGrids.
+    """
+
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]:
+            raise Exception('Grids can only contain booleans')
+        if numpy is None:
+            raise ImportError('NumpyGrid requires numpy')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.data = numpy.full((width, height), bool(initialValue))
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def __eq__(self, other):
+        if other == None:
+            return False
+        return numpy.array_equal(self.data, other.data)
+
+    def __hash__(self):
+        # Same value as Grid.__hash__: bit i is set for the i-th cell in x-major order
+        packed = numpy.packbits(self.data.ravel(), bitorder='little')
+        return hash(int.from_bytes(packed.tobytes(), 'little'))
+
+    def copy(self):
+        g = NumpyGrid(self.width, self.height)
+        g.data = self.data.copy()
+        return g
+
+    def shallowCopy(self):
+        g = NumpyGrid(self.width, self.height)
+        g.data = self.data
+        return g
+
+    def count(self, item=True):
+        filled = int(numpy.count_nonzero(self.data))
+        if item:
+            return filled
+        return self.data.size - filled
+
+    def asList(self, key=True):
+        return [tuple(cell) for cell in numpy.argwhere(self.data == key).tolist()]
+
+    def packBits(self):
+        """
+        Returns the same (width, height, bitPackedInts...) tuple as Grid.packBits
+        """
+        cells = self.data.ravel()
+        numInts = len(cells) // self.CELLS_PER_INT + 1
+        padded = numpy.zeros(numInts * self.CELLS_PER_INT, dtype=numpy.int64)
+        padded[:len(cells)] = cells
+        weights = 1 << numpy.arange(self.CELLS_PER_INT - 1, -1, -1, dtype=numpy.int64)
+        ints = padded.reshape(numInts, self.CELLS_PER_INT) @ weights
+        return (self.width, self.height) + tuple(ints.tolist())
+
+    def _unpackBits(self, bits):
+        packed = numpy.array(bits, dtype=numpy.int64)
+        shifts = numpy.arange(self.CELLS_PER_INT - 1, -1, -1, dtype=numpy.int64)
+        cells = ((packed[:, None] >> shifts) & 1).astype(bool).ravel()
+        size = self.width * self.height
+        self.data[:, :] = cells[:size].reshape(self.width, self.height)
+
+
+GRID_CLASS = Grid
+
+
+def useNumpyGrids(enabled=True):
+    """
+    Selects the storage used for the walls and food grids that layouts build.
+    The list-of-lists Grid is the default.
+    """
+    global GRID_CLASS
+    if enabled and numpy is None:
+        raise ImportError('useNumpyGrids requires numpy')
+    GRID_CLASS = NumpyGrid if enabled else Grid
+
+
+def makeGrid(width, height, initialValue=False):
+    "Builds a boolean grid using the backend chosen by useNumpyGrids."
+    return GRID_CLASS(width, height, initialValue)
+
 ####################################
 # Parts you shouldn't have to read #
 ####################################
@@ -349,7 +447,17 @@ class Actions:
         return (dx * speed, dy * speed)
     directionToVector = staticmethod(directionToVector)
 
-    def getPossibleActions(config, walls):
+    def getPossibleActions(config, walls, moveTable=None):
+        """
+        Returns the actions available from config.  If moveTable (see
+        buildMoveTable) is given, positions on the grid are looked up in it
+        instead of checking the walls.
+        """
+        if moveTable is not None:
+            moves = moveTable.get(config.pos)
+            if moves is not None:
+                return list(moves[0])
+
         possible = []
         x, y = config.pos
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -369,7 +477,12 @@ class Actions:
 
     getPossibleActions = staticmethod(getPossibleActions)
 
-    def getLegalNeighbors(position, walls):
+    def getLegalNeighbors(position, walls, moveTable=None):
+        if moveTable is not None:
+            moves = moveTable.get(position)
+            if moves is not None:
+                return list(moves[1])
+
         x, y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
         neighbors = []
@@ -386,6 +499,26 @@ class Actions:
         return neighbors
     getLegalNeighbors = staticmethod(getLegalNeighbors)
 
+    def buildMoveTable(walls):
+        """
+        Precomputes, for every open cell (x, y) of walls, the tuple of legal
+        actions and the tuple of legal neighbor cells, in the same order that
+        getPossibleActions and getLegalNeighbors return them.
+        """
+        moveTable = {}
+        for x, y in walls.asList(False):
+            actions = []
+            neighbors = []
+            for dir, (dx, dy) in Actions._directionsAsList:
+                next_x, next_y = x + dx, y + dy
+                if 0 <= next_x < walls.width and 0 <= next_y < walls.height \
+                        and not walls[next_x][next_y]:
+                    actions.append(dir)
+                    neighbors.append((next_x, next_y))
+            moveTable[(x, y)] = (tuple(actions), tuple(neighbors))
+        return moveTable
+    buildMoveTable = staticmethod(buildMoveTable)
+
     def getSuccessor(position, action):
         dx, dy = Actions.directionToVector(action)
         x, y = position
@@ -393,19 +526,46 @@ class Actions:
     getSuccessor = staticmethod(getSuccessor)
 
 
+_zobristRandom = random.Random(188)
+_zobristKeys = {}
+
+
+def zobristKey(feature):
+    """
+    Returns the random 64-bit key for a hashable state feature such as
+    ('food', x, y), drawing it the first time the feature is seen.  Keys come
+    from a private generator so that hashing never disturbs the random module.
+    """
+    key = _zobristKeys.get(feature)
+    if key is None:
+        key = _zobristKeys[feature] = _zobristRandom.getrandbits(64)
+    return key
+
+
 class GameStateData:
 
     def __init__(self, prevState=None):
         """
-        Generates a new data packet by copying information from its predecessor.
+        Generates a new data packet from its predecessor.
+
+        The food grid, capsule list and agent states are shared with the
+        predecessor rather than copied.  Code that modifies them must first
+        replace them with a private copy, which copyAgentState, removeFood and
+        removeCapsule do while keeping the Zobrist key up to date.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates(prevState.agentStates)
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._zobrist = prevState._zobrist
+        else:
+            self._zobrist = 0
+        # Agents whose key has been XORed out of _zobrist while the rules
+        # modify them; rehashAgents XORs their new key back in.
+        self._unhashedAgents = []
 
         self._foodEaten = None
         self._foodAdded = None
@@ -418,6 +578,8 @@ class GameStateData:
     def deepCopy(self):
         state = GameStateData(self)
         state.food = self.food.deepCopy()
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates(self.agentStates)
         state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
@@ -431,6 +593,97 @@ class GameStateData:
             copiedStates.append(agentState.copy())
         return copiedStates
 
+    def copyAgentState(self, index):
+        """
+        Replaces the agent state at index with a private copy and returns it,
+        so that it can be modified without affecting the predecessor state.
+
+        The agent's Zobrist key is removed until the next call to rehashAgents.
+        """
+        if index not in self._unhashedAgents:
+            self._zobrist ^= self._agentKey(index)
+            self._unhashedAgents.append(index)
+        agentState = self.agentStates[index].copy()
+        self.agentStates[index] = agentState
+        return agentState
+
+    def rehashAgents(self):
+        "Adds back the Zobrist keys of the agents modified since copyAgentState."
+        for index in self._unhashedAgents:
+            self._zobrist ^= self._agentKey(index)
+        self._unhashedAgents = []
+
+    def removeFood(self, x, y):
+        "Eats the food at (x, y), copying the shared food grid first."
+        self.food = self.food.copy()
+        self.food[x][y] = False
+        self._zobrist ^= zobristKey(('food', x, y))
+
+    def removeCapsule(self, position):
+        "Eats the capsule at position, copying the shared capsule list first."
+        self.capsules = self.capsules[:]
+        self.capsules.remove(position)
+        self._zobrist ^= zobristKey(('capsule', position))
+
+    def pack(self):
+        """
+        Returns a compact, picklable tuple describing this state: the food as a
+        bitmask, the capsules, each agent's position, direction and scared
+        timer, the score and the win/lose flags.  The layout is left out; see
+        unpack.
+        """
+        height = self.food.height
+        foodBits = 0
+        for x, y in self.food.asList():
+            foodBits |= 1 << (x * height + y)
+        agents = []
+        for agentState in self.agentStates:
+            configuration = agentState.configuration
+            if configuration == None:
+                agents.append((None, None, agentState.scaredTimer))
+            else:
+                agents.append((configuration.pos, configuration.direction, agentState.scaredTimer))
+        return (foodBits, tuple(self.capsules), tuple(agents), self.score, self._win, self._lose)
+
+    def unpack(self, packed, layout):
+        "Fills in this state from the result of pack and the layout it was played on."
+        foodBits, capsules, agents, score, win, lose = packed
+        self.initialize(layout, len(agents) - 1)
+        height = layout.height
+        self.food = makeGrid(layout.width, layout.height, False)
+        while foodBits:
+            cell = (foodBits & -foodBits).bit_length() - 1
+            self.food[cell // height][cell % height] = True
+            foodBits &= foodBits - 1
+        self.capsules = list(capsules)
+        for agentState, (pos, direction, scaredTimer) in zip(self.agentStates, agents):
+            agentState.configuration = None if pos == None else Configuration(pos, direction)
+            agentState.scaredTimer = scaredTimer
+        self.score = score
+        self._win = win
+        self._lose = lose
+        self._zobrist = self.computeZobrist()
+
+    def _agentKey(self, index):
+        agentState = self.agentStates[index]
+        key = zobristKey(('scared', index, agentState.scaredTimer))
+        if agentState.configuration != None:
+            configuration = agentState.configuration
+            key ^= zobristKey(
+                ('agent', index, configuration.pos, configuration.direction))
+        return key
+
+    def computeZobrist(self):
+        "Computes the Zobrist key of this state from scratch."
+        key = 0
+        for x, y in self.food.asList():
+            key ^= zobristKey(('food', x, y))
+        for position in self.capsules:
+            key ^= zobristKey(('capsule', position))
+        for index in range(len(self.agentStates)):
+            key ^= self._agentKey(index)
+        return key
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -452,13 +705,7 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate(self.agentStates):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113 * hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575)
+        return self._zobrist ^ hash(self.score)
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
@@ -536,6 +783,7 @@ class GameStateData:
             self.agentStates.append(AgentState(
                 Configuration(pos, Directions.STOP), isPacman))
         self._eaten = [False for a in self.agentStates]
+        self._zobrist = self.computeZobrist()
 
 
 try:
@@ -13,12 +13,24 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Directions
+from game import makeGrid
+from game import Actions
+import hashlib
+import mmap
 import os
 import random
-from functools import reduce
+import struct
+import sys
+
+import cacheFiles
 
 VISIBILITY_MATRIX_CACHE = {}
+VISIBILITY_CACHE_DIR = cacheFiles.getCacheDirectory('visibility')
+LAYOUT_CACHE = {}
+BUNDLE_NAME = 'layouts.bundle'
+BUNDLE_MAGIC = b'PLB1'
+_bundles = {}
 
 
 class Layout:
@@ -29,12 +41,13 @@ class Layout:
     def __init__(self, layoutText):
         self.width = len(layoutText[0])
         self.height = len(layoutText)
-        self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
+        self.walls = makeGrid(self.width, self.height, False)
+        self.food = makeGrid(self.width, self.height, False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
+        self.moveTable = Actions.buildMoveTable(self.walls)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
         # self.initializeVisibilityMatrix()
@@ -43,28 +56,10 @@ class Layout:
         return self.numGhosts
 
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5, 0), (0.5, 0), (0, -0.5), (0, 0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH,
-                    Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH: set(), Directions.SOUTH: set(
-            ), Directions.EAST: set(), Directions.WEST: set(), Directions.STOP: set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)]:
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(
-                str.__add__, self.layoutText)]
+        key = layoutHash(self.layoutText)
+        if key not in VISIBILITY_MATRIX_CACHE:
+            VISIBILITY_MATRIX_CACHE[key] = VisibilityMatrix(self.walls, key)
+        self.visibility = VISIBILITY_MATRIX_CACHE[key]
 
     def isWall(self, pos):
         x, col = pos
@@ -90,14 +85,23 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
-        row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        if 'visibility' not in self.__dict__:
+            self.initializeVisibilityMatrix()
+        return self.visibility.isVisible(ghostPos, pacPos, pacDirection)
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Clones the parsed board instead of parsing layoutText again."
+        layout = Layout.__new__(Layout)
+        layout.__dict__.update(self.__dict__)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.layoutText = self.layoutText[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -137,28 +141,277 @@ class Layout:
             self.numGhosts += 1
 
 
+def layoutHash(layoutText):
+    "A stable hash of the layout text, used to name cache files."
+    return hashlib.sha1('\n'.join(layoutText).encode()).hexdigest()
+
+
+class VisibilityMatrix:
+    """
+    For every open cell and the directions Pacman can face, the positions
+    seen looking straight ahead from that cell up to the first wall.  Ghosts
+    can be between cells, so positions are on a half-cell lattice.
+
+    Each visible set is a bitset with bit (2x) * (2 * height) + 2y for
+    position (x, y), stored as a fixed number of bytes so that a lookup reads
+    a single byte.  The table is written to a cache file named after the
+    layout hash (see cacheFiles.py), so later processes map it into memory
+    instead of recomputing.
+    """
+    DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+
+    def __init__(self, walls, key=None, cacheDir=VISIBILITY_CACHE_DIR):
+        self.cells = walls.asList(False)
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.width = walls.width
+        self.height = walls.height
+        self.recordSize = (4 * self.width * self.height + 7) // 8
+        self.table = None
+        path = None
+        if key is not None and cacheDir is not None:
+            path = os.path.join(cacheDir, key + '.vis')
+            cacheKey = 'VisibilityMatrix %s %dx%d' % (key, self.width, self.height)
+            self.table = cacheFiles.loadCacheFile(path, cacheKey, 4 * len(self.cells) * self.recordSize)
+        if self.table is None:
+            self.table = self._compute(walls)
+            if path is not None:
+                cacheFiles.saveCacheFile(path, cacheKey, self.table)
+
+    def isVisible(self, ghostPos, pacPos, pacDirection):
+        "Whether ghostPos is seen from the cell holding pacPos facing pacDirection."
+        cellId = self.cellIds.get(tuple(int(x) for x in pacPos))
+        if cellId is None or pacDirection not in self.DIRECTIONS:
+            return False
+        x2, y2 = int(round(2 * ghostPos[0])), int(round(2 * ghostPos[1]))
+        if not (0 <= x2 < 2 * self.width and 0 <= y2 < 2 * self.height):
+            return False
+        bit = x2 * 2 * self.height + y2
+        record = (4 * cellId + self.DIRECTIONS.index(pacDirection)) * self.recordSize
+        return (self.table[record + bit // 8] >> (bit % 8)) & 1 == 1
+
+    def getVisible(self, pos, direction):
+        "Returns the set of positions seen from pos facing direction."
+        if pos not in self.cellIds or direction not in self.DIRECTIONS:
+            return set()
+        record = (4 * self.cellIds[pos] + self.DIRECTIONS.index(direction)) * self.recordSize
+        bits = int.from_bytes(self.table[record:record + self.recordSize], 'little')
+        visible = set()
+        height2 = 2 * self.height
+        while bits:
+            bit = (bits & -bits).bit_length() - 1
+            visible.add((bit // height2 / 2, bit % height2 / 2))
+            bits &= bits - 1
+        return visible
+
+    def _compute(self, walls):
+        """
+        Builds every ray from the one next to it: looking east from (x, y)
+        sees (x + 0.5, y), then, unless (x + 1, y) is a wall, that cell and
+        everything seen looking east from it.  Rows and columns are swept
+        once in each direction.
+        """
+        width, height, height2 = self.width, self.height, 2 * self.height
+        rays = dict((cell, [0, 0, 0, 0]) for cell in self.cells)
+        sweeps = [(0, 1, range(height - 1, -1, -1), False),  # north
+                  (1, -1, range(height), False),             # south
+                  (2, 1, range(width - 1, -1, -1), True),    # east
+                  (3, -1, range(width), True)]               # west
+        for direction, step, order, horizontal in sweeps:
+            for line in range(height if horizontal else width):
+                for i in order:
+                    x, y = (i, line) if horizontal else (line, i)
+                    if walls[x][y]:
+                        continue
+                    nx, ny = (x + step, y) if horizontal else (x, y + step)
+                    hx, hy = (2 * x + step, 2 * y) if horizontal else (2 * x, 2 * y + step)
+                    if not (0 <= hx < 2 * width and 0 <= hy < height2):
+                        continue
+                    bits = 1 << (hx * height2 + hy)
+                    if 0 <= nx < width and 0 <= ny < height and not walls[nx][ny]:
+                        bits |= (1 << (2 * nx * height2 + 2 * ny)) | rays[(nx, ny)][direction]
+                    rays[(x, y)][direction] = bits
+        return b''.join(bits.to_bytes(self.recordSize, 'little')
+                        for cell in self.cells for bits in rays[cell])
+
+
 def getLayout(name, back=2):
+    """
+    Finds name (or name.lay) in a layouts directory, or on its own, starting in
+    the current directory and then in up to back + 1 parent directories.
+    """
     if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None:
-            layout = tryToLoad(name)
+        candidates = ['layouts/' + name, name]
     else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None:
-            layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back - 1)
-        os.chdir(curdir)
-    return layout
+        candidates = ['layouts/' + name + '.lay', name + '.lay']
+    for level in range(max(back, -1) + 2):
+        for candidate in candidates:
+            layout = tryToLoad(os.path.join(*(['..'] * level + [candidate])))
+            if layout != None:
+                return layout
+    return None
 
 
 def tryToLoad(fullname):
-    if(not os.path.exists(fullname)):
+    """
+    Returns a copy of the layout stored in fullname, or None if there is no
+    such file.  Parsed layouts are cached by path and modification time, and
+    a compiled bundle next to the file is used instead of parsing when it is
+    up to date.
+    """
+    try:
+        stat = os.stat(fullname)
+    except OSError:
         return None
-    f = open(fullname)
+    key = os.path.abspath(fullname)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = LAYOUT_CACHE.get(key)
+    if cached == None or cached[0] != version:
+        bundle = getLayoutBundle(os.path.dirname(key))
+        layout = None
+        if bundle != None:
+            layout = bundle.getLayout(os.path.basename(key), version)
+        if layout == None:
+            f = open(fullname)
+            try:
+                layout = Layout([line.strip() for line in f])
+            finally:
+                f.close()
+        cached = LAYOUT_CACHE[key] = (version, layout)
+    return cached[1].deepCopy()
+
+
+def getLayoutBundle(directory):
+    "Returns the LayoutBundle compiled for directory, or None if there is none."
+    path = os.path.join(directory, BUNDLE_NAME)
     try:
-        return Layout([line.strip() for line in f])
-    finally:
-        f.close()
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if path not in _bundles or _bundles[path][0] != mtime:
+        try:
+            _bundles[path] = (mtime, LayoutBundle(path))
+        except (OSError, ValueError, struct.error):
+            _bundles[path] = (mtime, None)
+    return _bundles[path][1]
+
+
+class LayoutBundle:
+    """
+    The parsed layouts of a directory in one binary file, mapped into memory.
+
+    The file starts with an index of (file name, mtime, size, offset) entries.
+    Each record holds the board size, the layout text, the walls and food as
+    bitsets (bit x * height + y, as in Grid.__hash__), the capsules and the
+    agent positions.  A record is only used while the .lay file still has the
+    mtime and size it was compiled from.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:4] != BUNDLE_MAGIC:
+            raise ValueError('%s is not a layout bundle' % path)
+        count, = struct.unpack_from('<I', self.data, 4)
+        offset = 8
+        self.index = {}
+        for i in range(count):
+            nameLength, = struct.unpack_from('<H', self.data, offset)
+            name = self.data[offset + 2:offset + 2 + nameLength].decode()
+            offset += 2 + nameLength
+            mtime, size, recordOffset = struct.unpack_from('<qQQ', self.data, offset)
+            offset += 24
+            self.index[name] = ((mtime, size), recordOffset)
+
+    def getLayout(self, name, version):
+        "Decodes the layout compiled from name, or None if it is missing or stale."
+        entry = self.index.get(name)
+        if entry == None or entry[0] != version:
+            return None
+        data, offset = self.data, entry[1]
+        width, height, numGhosts, textLength = struct.unpack_from('<HHHI', data, offset)
+        offset += 10
+        layout = Layout.__new__(Layout)
+        layout.width = width
+        layout.height = height
+        layout.numGhosts = numGhosts
+        layout.layoutText = data[offset:offset + textLength].decode().split('\n')
+        offset += textLength
+        grids = []
+        for i in range(2):
+            length, = struct.unpack_from('<I', data, offset)
+            bits = int.from_bytes(data[offset + 4:offset + 4 + length], 'little')
+            grids.append(_gridFromBits(width, height, bits))
+            offset += 4 + length
+        layout.walls, layout.food = grids
+        numCapsules, = struct.unpack_from('<H', data, offset)
+        offset += 2
+        values = struct.unpack_from('<%dH' % (2 * numCapsules), data, offset)
+        layout.capsules = list(zip(values[::2], values[1::2]))
+        offset += 4 * numCapsules
+        numAgents, = struct.unpack_from('<H', data, offset)
+        offset += 2
+        values = struct.unpack_from('<' + 'BHH' * numAgents, data, offset)
+        layout.agentPositions = [(bool(values[i]), (values[i + 1], values[i + 2]))
+                                 for i in range(0, len(values), 3)]
+        layout.moveTable = Actions.buildMoveTable(layout.walls)
+        layout.totalFood = layout.food.count()
+        return layout
+
+
+def _gridToBits(grid):
+    bits = 0
+    for x in range(grid.width - 1, -1, -1):
+        for y in range(grid.height - 1, -1, -1):
+            bits = bits * 2 + (1 if grid[x][y] else 0)
+    return bits
+
+
+def _gridFromBits(width, height, bits):
+    grid = makeGrid(width, height, False)
+    cells = format(bits, 'b').zfill(width * height)[::-1]
+    for x in range(width):
+        grid[x] = [cell == '1' for cell in cells[x * height:(x + 1) * height]]
+    return grid
+
+
+def compileLayoutBundle(directory='layouts'):
+    """
+    Parses every .lay file in directory and writes them to a bundle that
+    tryToLoad reads instead of the text files.  Returns the bundle path.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.lay'))
+    records = []
+    index = []
+    for name in names:
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        with open(path) as f:
+            layout = Layout([line.strip() for line in f])
+        text = '\n'.join(layout.layoutText).encode()
+        record = [struct.pack('<HHHI', layout.width, layout.height, layout.numGhosts, len(text)), text]
+        for grid in (layout.walls, layout.food):
+            bits = _gridToBits(grid)
+            packed = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+            record.append(struct.pack('<I', len(packed)) + packed)
+        record.append(struct.pack('<H', len(layout.capsules)))
+        for x, y in layout.capsules:
+            record.append(struct.pack('<HH', x, y))
+        record.append(struct.pack('<H', len(layout.agentPositions)))
+        for isPacman, (x, y) in layout.agentPositions:
+            record.append(struct.pack('<BHH', isPacman, x, y))
+        records.append(b''.join(record))
+        index.append((name.encode(), stat.st_mtime_ns, stat.st_size))
+
+    offset = 8 + sum(2 + len(name) + 24 for name, mtime, size in index)
+    header = [BUNDLE_MAGIC, struct.pack('<I', len(index))]
+    for (name, mtime, size), record in zip(index, records):
+        header.append(struct.pack('<H', len(name)) + name + struct.pack('<qQQ', mtime, size, offset))
+        offset += len(record)
+    path = os.path.join(directory, BUNDLE_NAME)
+    with open(path, 'wb') as f:
+        f.write(b''.join(header + records))
+    return path
+
+
+if __name__ == '__main__':
+    print('Wrote %s' % compileLayoutBundle(*sys.argv[1:2]))
@@ -13,14 +13,18 @@
 
 
 from statistics import mean
-from pyrsistent import v
 from util import manhattanDistance
 from game import Directions
 import random, util
+import ghostAgents
+import pacmanAgents
+import concurrent.futures
 import math
+import multiprocessing
+import time
 
 from game import Agent
-from pacman import GameState
+from pacman import ClassicGameRules, GameState
 
 class ReflexAgent(Agent):
     """
@@ -119,10 +123,236 @@ class MultiAgentSearchAgent(Agent):
     is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    MOVE_ORDERINGS = ('killer', 'history', 'static')
+    # Whether a stored value is exact or only bounds the node's value
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', ordering = '',
+                 workers = '0', split = 'root'):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
+        self.setMoveOrdering(ordering)
+        self.resetSearchCounters()
+        self.workers = int(workers)
+        if split not in ('root', 'ghost'):
+            raise Exception('Unknown split: %s' % split)
+        self.split = split
+        self.workerPool = None
+        self.workerLayout = None
+
+    def setMoveOrdering(self, ordering):
+        """
+        ordering: the move ordering heuristics to use, joined by '+' (commas
+        separate agent arguments on the command line), tried in this order:
+          killer  - the last two moves that caused a cutoff at the same ply
+          history - moves that caused cutoffs anywhere, weighted by depth
+          static  - the evaluation function on each successor, best first
+        """
+        self.moveOrdering = [name for name in ordering.split('+') if name]
+        for name in self.moveOrdering:
+            if name not in self.MOVE_ORDERINGS:
+                raise Exception('Unknown move ordering: %s' % name)
+        self.killerMoves = {}
+        self.historyScores = {}
+
+    def resetSearchCounters(self):
+        "Counts of search nodes, cutoffs and generated successors since creation."
+        self.nodesSearched = 0
+        self.cutoffs = 0
+        self.successorsGenerated = 0
+
+    def getSearchCounters(self):
+        return {'nodesSearched': self.nodesSearched, 'cutoffs': self.cutoffs,
+                'successorsGenerated': self.successorsGenerated}
+
+    def generateSuccessor(self, gameState, agentIndex, action):
+        self.successorsGenerated += 1
+        return gameState.generateSuccessor(agentIndex, action)
+
+    def orderMoves(self, gameState, agentIndex, ply, firstAction=None, leafChildren=False):
+        """
+        Returns (action, successor) pairs for the legal actions of agentIndex,
+        with firstAction (if legal) first and the rest sorted by the move
+        orderings.  successor is None unless static ordering generated it.
+
+        leafChildren: the successors will be scored by the evaluation function
+        anyway, so static ordering is skipped instead of scoring them twice.
+        """
+        actions = gameState.getLegalActions(agentIndex)
+        if not self.moveOrdering:
+            if firstAction in actions and firstAction != actions[0]:
+                actions = [firstAction] + [action for action in actions if action != firstAction]
+            return [(action, None) for action in actions]
+
+        killers = self.killerMoves.get(ply, ())
+        if agentIndex == 0:
+            position = gameState.getPacmanPosition()
+        else:
+            position = gameState.getGhostPosition(agentIndex)
+        sign = 1 if agentIndex == 0 else -1
+        moves = []
+        for action in actions:
+            key = [action == firstAction]
+            successor = None
+            for name in self.moveOrdering:
+                if name == 'killer':
+                    key.append(action in killers)
+                elif name == 'history':
+                    key.append(self.historyScores.get((agentIndex, position, action), 0))
+                elif not leafChildren:
+                    successor = self.generateSuccessor(gameState, agentIndex, action)
+                    key.append(sign * self.evaluationFunction(successor))
+            moves.append((key, action, successor))
+        moves.sort(key=lambda move: move[0], reverse=True)
+        return [(action, successor) for key, action, successor in moves]
+
+    def recordCutoff(self, gameState, agentIndex, ply, depth, action):
+        "Updates the killer moves and history scores after action caused a cutoff."
+        self.cutoffs += 1
+        if 'killer' in self.moveOrdering:
+            killers = self.killerMoves.setdefault(ply, [])
+            if action not in killers:
+                killers.insert(0, action)
+                del killers[2:]
+        if 'history' in self.moveOrdering:
+            if agentIndex == 0:
+                position = gameState.getPacmanPosition()
+            else:
+                position = gameState.getGhostPosition(agentIndex)
+            key = (agentIndex, position, action)
+            self.historyScores[key] = self.historyScores.get(key, 0) + depth * depth
+
+    def isLeaf(self, gameState, depth):
+        "Whether the search stops at gameState, depth counting Pacman's moves from 0."
+        return gameState.isWin() or gameState.isLose() or depth == self.depth
+
+    def nextAgent(self, gameState, agentIndex, depth):
+        "The agent that moves after agentIndex, and the depth it moves at."
+        if agentIndex == gameState.getNumAgents() - 1:
+            return 0, depth + 1
+        return agentIndex + 1, depth
+
+    def setGhostModel(self, ghosts):
+        """
+        ghosts: 'uniform', or the name of a GhostAgent in ghostAgents.py (such
+        as DirectionalGhost) whose getDistribution models each ghost's moves.
+        """
+        if ghosts == 'uniform':
+            self.ghostModel = None
+        else:
+            self.ghostModel = util.lookup(ghosts, vars(ghostAgents))
+        self.ghostModels = {}
+
+    def getGhostDistribution(self, gameState, ghostIndex):
+        "(action, probability) pairs for the moves of ghostIndex, leaving out impossible ones."
+        actions = gameState.getLegalActions(ghostIndex)
+        if self.ghostModel is None:
+            weight = 1 / len(actions)
+            return [(action, weight) for action in actions]
+        if ghostIndex not in self.ghostModels:
+            self.ghostModels[ghostIndex] = self.ghostModel(ghostIndex)
+        distribution = self.ghostModels[ghostIndex].getDistribution(gameState)
+        return [(action, distribution[action]) for action in actions if distribution[action] > 0]
+
+    def getGhostActions(self, gameState, ghostIndex):
+        "The ghost moves searched below gameState, in the order combineValues expects."
+        return gameState.getLegalActions(ghostIndex)
+
+    def value(self, gameState, agentIndex, depth):
+        "The value of gameState with agentIndex to move; defined by subclasses."
+        util.raiseNotDefined()
+
+    def combineValues(self, gameState, agentIndex, values):
+        "The value of a ghost node from the values of its successors; defined by subclasses."
+        util.raiseNotDefined()
+
+    def rootValues(self, gameState):
+        """
+        Returns the value of each of Pacman's legal actions in gameState, in
+        the order of getLegalActions(0).
+
+        With workers > 0 the subtree below each action is searched by a
+        persistent pool of worker processes; with split='ghost' the subtrees
+        below the first ghost's moves are sent instead, and combined here in
+        the same order as the serial search, so the values are identical.
+        Game states are sent as GameState.pack tuples and rebuilt by the
+        workers, which are given the layout once when the pool starts.
+        """
+        actions = gameState.getLegalActions(0)
+        successors = [gameState.generateSuccessor(0, action) for action in actions]
+        if self.workers <= 0:
+            return [self.value(successor, 1, 0) for successor in successors]
+
+        tasks, owners = [], []
+        splitSuccessors = []
+        for i, successor in enumerate(successors):
+            if self.split == 'ghost' and not self.isLeaf(successor, 0):
+                splitSuccessors.append(i)
+                agentIndex, depth = self.nextAgent(successor, 1, 0)
+                for action in self.getGhostActions(successor, 1):
+                    tasks.append((successor.generateSuccessor(1, action).pack(), agentIndex, depth))
+                    owners.append(i)
+            else:
+                tasks.append((successor.pack(), 1, 0))
+                owners.append(i)
+
+        results = [[] for successor in successors]
+        pool = self.getWorkerPool(gameState.data.layout)
+        for i, value in zip(owners, pool.map(_searchSubtree, tasks)):
+            results[i].append(value)
+        values = [values[0] for values in results]
+        for i in splitSuccessors:
+            values[i] = self.combineValues(successors[i], 1, results[i])
+        return values
+
+    def getWorkerPool(self, layout):
+        "Starts the worker pool, or restarts it if the layout has changed."
+        if self.workerPool is not None and self.workerLayout.layoutText != layout.layoutText:
+            self.shutdownWorkers()
+        if self.workerPool is None:
+            # Forked workers inherit the agent and layout without pickling them
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            else:
+                context = multiprocessing.get_context()
+            self.workerLayout = layout
+            self.workerPool = concurrent.futures.ProcessPoolExecutor(
+                self.workers, context, _initSearchWorker, (self, layout))
+        return self.workerPool
+
+    def shutdownWorkers(self):
+        if self.workerPool is not None:
+            self.workerPool.shutdown()
+            self.workerPool = None
+            self.workerLayout = None
+
+    def __getstate__(self):
+        # A pool cannot be pickled, and workers never need their own
+        state = self.__dict__.copy()
+        state['workerPool'] = None
+        state['workerLayout'] = None
+        return state
+
+_searchWorker = None
+
+def _initSearchWorker(agent, layout):
+    global _searchWorker
+    agent.workers = 0
+    _searchWorker = (agent, layout)
+
+def _searchSubtree(task):
+    packed, agentIndex, depth = task
+    agent, layout = _searchWorker
+    return agent.value(GameState.unpack(packed, layout), agentIndex, depth)
+
+def _searchMonteCarloTree(task):
+    packed, seed, iterations = task
+    agent, layout = _searchWorker
+    random.seed(seed)
+    # A worker may run several tasks, and each must grow a tree of its own
+    agent.root = None
+    return agent.searchTree(GameState.unpack(packed, layout), iterations)
 
 class MinimaxAgent(MultiAgentSearchAgent):
     """
@@ -153,111 +383,240 @@ class MinimaxAgent(MultiAgentSearchAgent):
         Returns whether or not the game state is a losing state
         """
         "*** YOUR CODE HERE ***"
-        # ghostIndex = [ i for i in range(1, gameState.getNumAgents())]
+        results = list(zip(gameState.getLegalActions(0), self.rootValues(gameState)))
+        results.sort(key=lambda x: x[1])
 
-        # ##check if we already at terminal state
-        # if self.depth == 0 or gameState.isWin() or gameState.isLose():
-        #     return self.evaluationFunction
+        return results[-1][0]
 
-        # Collect Pacman legal moves and successor states
-        GhostList = [i for i in range(1, gameState.getNumAgents())]
-        
+    def value(self, gameState, agentIndex, depth):
+        if agentIndex == 0:
+            return self.maxValue(gameState, depth)
+        return self.minValue(gameState, depth, agentIndex)
 
-        def max_value(gamestate, depth):  # maximizer for pacman
-            if gamestate.isWin() or gamestate.isLose() or depth == self.depth:
-                return self.evaluationFunction(gamestate)
+    def maxValue(self, gameState, depth):  # maximizer for pacman
+        if self.isLeaf(gameState, depth):
+            return self.evaluationFunction(gameState)
 
-            maxval = -math.inf
-            for action in gamestate.getLegalActions(0):
-                maxval = max(maxval, min_value(gamestate.generateSuccessor(0, action), depth, 1))
-            return maxval
+        maxval = -math.inf
+        for action in gameState.getLegalActions(0):
+            maxval = max(maxval, self.minValue(gameState.generateSuccessor(0, action), depth, 1))
+        return maxval
 
-        def min_value(gamestate, depth, ghostindex):  # minimizer
-            
-            if gamestate.isWin() or gamestate.isLose() or depth == self.depth:
-                return self.evaluationFunction(gamestate)
+    def minValue(self, gameState, depth, ghostIndex):  # minimizer
+        if self.isLeaf(gameState, depth):
+            return self.evaluationFunction(gameState)
 
-            minval = math.inf
-            for action in gamestate.getLegalActions(ghostindex):
-                if ghostindex == GhostList[-1]: ##last ghost 
-                    minval = min(minval, max_value(gamestate.generateSuccessor(ghostindex, action), depth + 1)) ##then goes down the next depth with pacman
-                else:
-                    minval = min(minval, min_value(gamestate.generateSuccessor(ghostindex, action), depth, ghostindex + 1)) ##otherwise continue to find the value for the current ghost
-            return minval
+        ##the last ghost hands over to pacman one level down, the others to the next ghost
+        nextIndex, nextDepth = self.nextAgent(gameState, ghostIndex, depth)
+        values = [self.value(gameState.generateSuccessor(ghostIndex, action), nextIndex, nextDepth)
+                  for action in gameState.getLegalActions(ghostIndex)]
+        return self.combineValues(gameState, ghostIndex, values)
 
-        results = [(action, min_value(gameState.generateSuccessor(0, action), 0, 1)) for action in gameState.getLegalActions(0)]
-        results.sort(key=lambda x: x[1])
+    def combineValues(self, gameState, ghostIndex, values):
+        minval = math.inf
+        for value in values:
+            minval = min(minval, value)
+        return minval
 
-        return results[-1][0]
 
 
+class SearchTimeout(Exception):
+    "Raised inside a search when its time limit runs out."
+    pass
 
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
     Your minimax agent with alpha-beta pruning (question 3)
+
+    Given a timeLimit in seconds, the agent instead deepens its search one ply
+    at a time up to self.depth and plays the best move of the deepest search
+    that finished in time.  Those searches share a transposition table keyed
+    on the Zobrist hash of the state, which returns stored values and tries
+    the stored best move first.  Keep timeLimit below the game's move timeout
+    (ClassicGameRules.getMoveTimeout); 'move' uses MOVE_TIME_FRACTION of the
+    default move timeout, and 'inf' deepens with no time limit.
     """
+    MAX_TRANSPOSITIONS = 500000
+    # Leaves time for the move to be returned after the deadline is noticed
+    MOVE_TIME_FRACTION = 0.9
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', timeLimit = None, ordering = ''):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, ordering)
+        if timeLimit == 'move':
+            timeLimit = self.MOVE_TIME_FRACTION * ClassicGameRules().getMoveTimeout(self.index)
+        self.timeLimit = None if timeLimit is None else float(timeLimit)
+        self.transpositions = None
+        self.deadline = None
+        self.completedDepth = 0
+
+    def registerInitialState(self, gameState):
+        # Zobrist hashes do not cover the walls, so a new layout needs a new table
+        self.transpositions = None
 
     def getAction(self, gameState: GameState):
         """
         Returns the minimax action using self.depth and self.evaluationFunction
         """
         "*** YOUR CODE HERE ***"
-        GhostList = [i for i in range(1, gameState.getNumAgents())]
-        
-
-        def max_value(gamestate, depth, alpha, beta):  # maximizer for pacman
-            if gamestate.isWin() or gamestate.isLose() or depth == self.depth:
-                return self.evaluationFunction(gamestate)
-
-            maxval = -math.inf
-            for action in gamestate.getLegalActions(0):
-                maxval = max(maxval, min_value(gamestate.generateSuccessor(0, action), depth, 1, alpha, beta))
-                if maxval > beta:
-                    return maxval
-                alpha = max(alpha, maxval)
-            return maxval
-
-        def min_value(gamestate, depth, ghostindex, alpha, beta):  # minimizer
-            
-            if gamestate.isWin() or gamestate.isLose() or depth == self.depth:
-                return self.evaluationFunction(gamestate)
-
-            minval = math.inf
-            for action in gamestate.getLegalActions(ghostindex):
-                if ghostindex == GhostList[-1]: ##last ghost 
-                    minval = min(minval, max_value(gamestate.generateSuccessor(ghostindex, action), depth + 1, alpha, beta)) ##then goes down the next depth with pacman
-                else:
-                    minval = min(minval, min_value(gamestate.generateSuccessor(ghostindex, action), depth, ghostindex + 1, alpha, beta)) ##otherwise continue to find the value for the current ghost
-                if minval < alpha:
-                    return minval
-                beta = min(beta, minval)
-            return minval
-        
-        def alphabeta(gamestate):
-            val = -math.inf
-            act = None
-            alpha = -math.inf
-            beta = math.inf
-
-            for action in gamestate.getLegalActions(0):  # maximizing
-                tmp = min_value(gameState.generateSuccessor(0, action), 0, 1, alpha, beta)
-
-                if val < tmp:  # same as v = max(v, tmp)
-                    val = tmp
-                    act = action
-
-                if val > beta:  # pruning leafs
-                    return val
-                alpha = max(alpha, tmp)
-
-            return act
-
-        return alphabeta(gameState)
+        if self.timeLimit is None:
+            return self.alphaBetaAction(gameState, self.depth)
+        return self.iterativeDeepeningAction(gameState)
+
+    def iterativeDeepeningAction(self, gameState):
+        if self.transpositions is None or len(self.transpositions) > self.MAX_TRANSPOSITIONS:
+            self.transpositions = {}
+        self.deadline = time.time() + self.timeLimit
+        bestAction = gameState.getLegalActions(0)[0]
+        self.completedDepth = 0
+        try:
+            for depth in range(1, self.depth + 1):
+                bestAction = self.alphaBetaAction(gameState, depth)
+                self.completedDepth = depth
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+        return bestAction
+
+    def alphaBetaAction(self, gameState, depth):
+        "Returns the best action of a depth-limited alpha-beta search."
+        self.searchDepth = depth
+        self.nodesSearched += 1
+        bestValue, bestAction = -math.inf, None
+        alpha, beta = -math.inf, math.inf
+        for action, successor in self.orderedActions(gameState, 0, depth):
+            successor = successor or self.generateSuccessor(gameState, 0, action)
+            value = self.minValue(successor, depth, 1, alpha, beta)
+            if bestValue < value:
+                bestValue, bestAction = value, action
+            alpha = max(alpha, value)
+        self.storeTransposition(gameState, 0, depth, bestValue, self.EXACT, bestAction)
+        return bestAction
+
+    def maxValue(self, gameState, depth, alpha, beta):
+        "Pacman's value with depth moves left for Pacman."
+        self.nodesSearched += 1
+        if gameState.isWin() or gameState.isLose() or depth == 0:
+            return self.evaluationFunction(gameState)
+        stored = self.probeTransposition(gameState, 0, depth, alpha, beta)
+        if stored is not None:
+            return stored
+        alphaOrig = alpha
+        maxval, bestAction = -math.inf, None
+        for action, successor in self.orderedActions(gameState, 0, depth):
+            successor = successor or self.generateSuccessor(gameState, 0, action)
+            value = self.minValue(successor, depth, 1, alpha, beta)
+            if value > maxval:
+                maxval, bestAction = value, action
+            if maxval > beta:
+                self.recordCutoff(gameState, 0, self.getPly(gameState, 0, depth), depth, action)
+                self.storeTransposition(gameState, 0, depth, maxval, self.LOWER, bestAction)
+                return maxval
+            alpha = max(alpha, maxval)
+        flag = self.UPPER if maxval <= alphaOrig else self.EXACT
+        self.storeTransposition(gameState, 0, depth, maxval, flag, bestAction)
+        return maxval
+
+    def minValue(self, gameState, depth, ghostIndex, alpha, beta):
+        "A ghost's value with depth moves left for Pacman, counting the current one."
+        self.nodesSearched += 1
+        if gameState.isWin() or gameState.isLose() or depth == 0:
+            return self.evaluationFunction(gameState)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+        stored = self.probeTransposition(gameState, ghostIndex, depth, alpha, beta)
+        if stored is not None:
+            return stored
+        lastGhost = ghostIndex == gameState.getNumAgents() - 1
+        betaOrig = beta
+        minval, bestAction = math.inf, None
+        for action, successor in self.orderedActions(gameState, ghostIndex, depth):
+            successor = successor or self.generateSuccessor(gameState, ghostIndex, action)
+            if lastGhost:
+                value = self.maxValue(successor, depth - 1, alpha, beta)
+            else:
+                value = self.minValue(successor, depth, ghostIndex + 1, alpha, beta)
+            if value < minval:
+                minval, bestAction = value, action
+            if minval < alpha:
+                self.recordCutoff(gameState, ghostIndex, self.getPly(gameState, ghostIndex, depth), depth, action)
+                self.storeTransposition(gameState, ghostIndex, depth, minval, self.UPPER, bestAction)
+                return minval
+            beta = min(beta, minval)
+        flag = self.LOWER if minval >= betaOrig else self.EXACT
+        self.storeTransposition(gameState, ghostIndex, depth, minval, flag, bestAction)
+        return minval
+
+    def orderedActions(self, gameState, agentIndex, depth):
+        "The (action, successor) pairs of agentIndex, with the stored best move first."
+        firstAction = None
+        if self.deadline is not None:
+            entry = self.transpositions.get((hash(gameState), agentIndex))
+            if entry is not None:
+                firstAction = entry[3]
+        leafChildren = agentIndex == gameState.getNumAgents() - 1 and depth == 1
+        return self.orderMoves(gameState, agentIndex, self.getPly(gameState, agentIndex, depth),
+                               firstAction, leafChildren)
+
+    def getPly(self, gameState, agentIndex, depth):
+        "The number of moves between the root and a node."
+        return (self.searchDepth - depth) * gameState.getNumAgents() + agentIndex
+
+    def probeTransposition(self, gameState, agentIndex, depth, alpha, beta):
+        "Returns a stored value that settles this node, or None."
+        if self.deadline is None:
+            return None
+        entry = self.transpositions.get((hash(gameState), agentIndex))
+        if entry is None or entry[0] < depth:
+            return None
+        storedDepth, value, flag, bestAction = entry
+        if flag == self.EXACT or (flag == self.LOWER and value > beta) or \
+                (flag == self.UPPER and value < alpha):
+            return value
+        return None
+
+    def storeTransposition(self, gameState, agentIndex, depth, value, flag, bestAction):
+        if self.deadline is not None:
+            self.transpositions[(hash(gameState), agentIndex)] = (depth, value, flag, bestAction)
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
       Your expectimax agent (question 4)
+
+      Besides the options of MultiAgentSearchAgent:
+
+      ghosts: how ghosts move; see setGhostModel.
+      cacheSize: if positive, chance node values are memoized, keyed by the
+        Zobrist hash of the state, the ghost to move and the remaining depth.
+        The table is kept between moves and cleared when it fills up.
+      pruning: 'star1' or 'star2' to prune chance nodes whose value can no
+        longer matter (Ballard's *-minimax).  This needs bounds minEval and
+        maxEval on the evaluation function; evaluations are clipped to them.
+        Pacman's moves are searched with alpha-beta and the move orderings.
+        Root actions with equal values may be broken differently.
     """
+    PRUNINGS = ('star1', 'star2')
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', ordering = '',
+                 workers = '0', split = 'root', ghosts = 'uniform', cacheSize = '0',
+                 pruning = '', minEval = None, maxEval = None):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, ordering, workers, split)
+        self.setGhostModel(ghosts)
+        self.cacheSize = int(cacheSize)
+        self.chanceValues = {}
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        if pruning and pruning not in self.PRUNINGS:
+            raise Exception('Unknown pruning: %s' % pruning)
+        if pruning and (minEval is None or maxEval is None):
+            raise Exception('%s pruning needs minEval and maxEval' % pruning)
+        self.pruning = pruning
+        if pruning:
+            self.minEval, self.maxEval = float(minEval), float(maxEval)
+
+    def registerInitialState(self, gameState):
+        # Zobrist hashes do not cover the walls, so a new layout needs a new table
+        self.chanceValues = {}
 
     def getAction(self, gameState: GameState):
         """
@@ -267,36 +626,352 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         legal moves.
         """
         "*** YOUR CODE HERE ***"
-        GhostList = [i for i in range(1, gameState.getNumAgents())]
-        
+        if self.cacheSize and len(self.chanceValues) > self.cacheSize:
+            self.chanceValues = {}
+        if self.pruning and self.workers <= 0:
+            return self.boundedRootAction(gameState)
+        results = list(zip(gameState.getLegalActions(0), self.rootValues(gameState)))
+        results.sort(key=lambda x: x[1])
 
-        def max_value(gamestate, depth):  # maximizer for pacman
-            if gamestate.isWin() or gamestate.isLose() or depth == self.depth:
-                return self.evaluationFunction(gamestate)
+        return results[-1][0]
 
-            maxval = -math.inf
-            for action in gamestate.getLegalActions(0):
-                maxval = max(maxval, exp_value(gamestate.generateSuccessor(0, action), depth, 1))
-            return maxval
-        
-        def exp_value(gamestate, depth, ghostindex):  # minimizer
-            
-            if gamestate.isWin() or gamestate.isLose() or depth == self.depth:
-                return self.evaluationFunction(gamestate)
-
-            expectedval = 0
-            weight = 1 / len(gamestate.getLegalActions(ghostindex))
-            for action in gamestate.getLegalActions(ghostindex):
-                if ghostindex == GhostList[-1]: ##last ghost 
-                    expectedval += weight * max_value(gamestate.generateSuccessor(ghostindex, action), depth + 1)##then goes down the next depth with pacman
+    def value(self, gameState, agentIndex, depth):
+        if self.pruning:
+            return self.boundedValue(gameState, agentIndex, depth, self.minEval, self.maxEval)
+        if agentIndex == 0:
+            return self.maxValue(gameState, depth)
+        return self.expValue(gameState, depth, agentIndex)
+
+    def maxValue(self, gameState, depth):  # maximizer for pacman
+        if self.isLeaf(gameState, depth):
+            return self.evaluationFunction(gameState)
+
+        maxval = -math.inf
+        for action in gameState.getLegalActions(0):
+            maxval = max(maxval, self.expValue(gameState.generateSuccessor(0, action), depth, 1))
+        return maxval
+
+    def expValue(self, gameState, depth, ghostIndex):  # chance node
+        if self.isLeaf(gameState, depth):
+            return self.evaluationFunction(gameState)
+        stored = self.probeChanceValue(gameState, ghostIndex, depth, -math.inf, math.inf)
+        if stored is not None:
+            return stored
+
+        ##the last ghost hands over to pacman one level down, the others to the next ghost
+        nextIndex, nextDepth = self.nextAgent(gameState, ghostIndex, depth)
+        distribution = self.getGhostDistribution(gameState, ghostIndex)
+        values = [self.value(gameState.generateSuccessor(ghostIndex, action), nextIndex, nextDepth)
+                  for action, probability in distribution]
+        expectedval = self.expectedValue(distribution, values)
+        self.storeChanceValue(gameState, ghostIndex, depth, expectedval, self.EXACT)
+        return expectedval
+
+    def getGhostActions(self, gameState, ghostIndex):
+        return [action for action, probability in self.getGhostDistribution(gameState, ghostIndex)]
+
+    def combineValues(self, gameState, ghostIndex, values):
+        return self.expectedValue(self.getGhostDistribution(gameState, ghostIndex), values)
+
+    def expectedValue(self, distribution, values):
+        expectedval = 0
+        for (action, probability), value in zip(distribution, values):
+            expectedval += probability * value
+        return expectedval
+
+    def boundedRootAction(self, gameState):
+        "The best root action, raising alpha as the actions are searched."
+        alpha, bestAction = self.minEval, None
+        for action in gameState.getLegalActions(0):
+            value = self.boundedValue(gameState.generateSuccessor(0, action), 1, 0, alpha, self.maxEval)
+            if bestAction is None or value > alpha:
+                alpha, bestAction = max(alpha, value), action
+        return bestAction
+
+    def boundedValue(self, gameState, agentIndex, depth, alpha, beta):
+        """
+        The value of gameState if it lies strictly between alpha and beta;
+        otherwise an upper bound no greater than alpha, or a lower bound no
+        smaller than beta.
+        """
+        self.nodesSearched += 1
+        if self.isLeaf(gameState, depth):
+            return min(self.maxEval, max(self.minEval, self.evaluationFunction(gameState)))
+        if agentIndex == 0:
+            return self.boundedMaxValue(gameState, depth, alpha, beta)
+        return self.boundedExpValue(gameState, depth, agentIndex, alpha, beta)
+
+    def boundedMaxValue(self, gameState, depth, alpha, beta, probe=False):
+        "Alpha-beta at Pacman's nodes; a probe searches only the first ordered move."
+        ply = depth * gameState.getNumAgents()
+        maxval = -math.inf
+        for action, successor in self.orderMoves(gameState, 0, ply):
+            successor = successor or self.generateSuccessor(gameState, 0, action)
+            value = self.boundedValue(successor, 1, depth, max(alpha, maxval), beta)
+            maxval = max(maxval, value)
+            if maxval >= beta:
+                self.recordCutoff(gameState, 0, ply, self.depth - depth, action)
+                break
+            if probe:
+                break
+        return maxval
+
+    def boundedExpValue(self, gameState, depth, ghostIndex, alpha, beta):
+        """
+        Star1 narrows the window of each successor so that the chance node
+        is cut off as soon as the successors searched so far, with the rest
+        at minEval or maxEval, put its value outside (alpha, beta).  Star2
+        first probes one Pacman move below each successor, which gives lower
+        bounds that can cut the node off before any full search.
+        """
+        stored = self.probeChanceValue(gameState, ghostIndex, depth, alpha, beta)
+        if stored is not None:
+            return stored
+        nextIndex, nextDepth = self.nextAgent(gameState, ghostIndex, depth)
+        distribution = self.getGhostDistribution(gameState, ghostIndex)
+        successors = [self.generateSuccessor(gameState, ghostIndex, action)
+                      for action, probability in distribution]
+        lowerBounds = [self.minEval] * len(successors)
+
+        if self.pruning == 'star2' and nextIndex == 0:
+            lowerTotal = self.minEval
+            for i, (action, probability) in enumerate(distribution):
+                lowerTotal -= probability * lowerBounds[i]
+                probeBeta = (beta - lowerTotal) / probability
+                if self.isLeaf(successors[i], nextDepth):
+                    value = self.boundedValue(successors[i], 0, nextDepth, self.minEval, self.maxEval)
                 else:
-                    expectedval += weight * exp_value(gamestate.generateSuccessor(ghostindex, action), depth, ghostindex + 1) ##otherwise continue to find the value for the current ghost
-            return expectedval
+                    value = self.boundedMaxValue(successors[i], nextDepth, self.minEval,
+                                                 min(self.maxEval, probeBeta), probe=True)
+                lowerBounds[i] = max(self.minEval, value)
+                lowerTotal += probability * lowerBounds[i]
+                if lowerTotal >= beta:
+                    self.cutoffs += 1
+                    self.storeChanceValue(gameState, ghostIndex, depth, lowerTotal, self.LOWER)
+                    return lowerTotal
+
+        searched = 0
+        restLower = sum(probability * lowerBound
+                        for (action, probability), lowerBound in zip(distribution, lowerBounds))
+        restProbability = 1
+        for i, (action, probability) in enumerate(distribution):
+            restLower -= probability * lowerBounds[i]
+            restProbability -= probability
+            restUpper = restProbability * self.maxEval
+            childAlpha = (alpha - searched - restUpper) / probability
+            childBeta = (beta - searched - restLower) / probability
+            value = self.boundedValue(successors[i], nextIndex, nextDepth,
+                                      max(lowerBounds[i], childAlpha), min(self.maxEval, childBeta))
+            if value <= childAlpha:
+                self.cutoffs += 1
+                bound = searched + probability * value + restUpper
+                self.storeChanceValue(gameState, ghostIndex, depth, bound, self.UPPER)
+                return bound
+            if value >= childBeta:
+                self.cutoffs += 1
+                bound = searched + probability * value + restLower
+                self.storeChanceValue(gameState, ghostIndex, depth, bound, self.LOWER)
+                return bound
+            searched += probability * value
+        self.storeChanceValue(gameState, ghostIndex, depth, searched, self.EXACT)
+        return searched
+
+    def probeChanceValue(self, gameState, ghostIndex, depth, alpha, beta):
+        "Returns a memoized value that settles this chance node, or None."
+        if not self.cacheSize:
+            return None
+        entry = self.chanceValues.get((hash(gameState), ghostIndex, self.depth - depth))
+        if entry is None:
+            self.cacheMisses += 1
+            return None
+        value, flag = entry
+        if flag == self.EXACT or (flag == self.LOWER and value >= beta) or \
+                (flag == self.UPPER and value <= alpha):
+            self.cacheHits += 1
+            return value
+        self.cacheMisses += 1
+        return None
+
+    def storeChanceValue(self, gameState, ghostIndex, depth, value, flag):
+        if self.cacheSize:
+            self.chanceValues[(hash(gameState), ghostIndex, self.depth - depth)] = (value, flag)
+
+class _MCTSNode:
+    """
+    A Pacman decision point of MCTSAgent, reached by a sequence of Pacman
+    actions.  Ghost moves are sampled anew on every visit, so the node's
+    value averages over them.  Pacman's position and the food and capsules
+    left depend only on Pacman's actions, which lets the tree be reused.
+    """
+    def __init__(self, gameState, parent=None, action=None):
+        self.parent = parent
+        self.action = action
+        self.position = gameState.getPacmanPosition()
+        self.numFood = gameState.getNumFood()
+        self.numCapsules = len(gameState.getCapsules())
+        self.children = {}
+        self.untriedActions = None
+        self.visits = 0
+        self.totalValue = 0.0
+
+    def matches(self, gameState):
+        "Whether gameState is one of the states this node stands for."
+        return self.position == gameState.getPacmanPosition() and \
+            self.numFood == gameState.getNumFood() and \
+            self.numCapsules == len(gameState.getCapsules())
+
+class MCTSAgent(MultiAgentSearchAgent):
+    """
+    A Monte Carlo tree search agent using UCT over Pacman's moves, with the
+    ghosts' moves sampled from the ghost model (see setGhostModel).  Each
+    iteration descends the tree, adds one node, plays a rollout of depth
+    Pacman moves and scores its final state with the evaluation function.
+    Pacman plays the most visited root action.
+
+    iterations: simulations per move; 0 for no limit when timeLimit is set.
+    timeLimit: seconds per move, or None.
+    rollout: 'random', or the name of a Pacman agent class whose getAction
+      plays the rollouts, such as ReflexAgent or GreedyAgent (pacmanAgents.py).
+    exploration: the UCT exploration constant, applied to values scaled to
+      [0, 1] by the lowest and highest values seen in the current search.
+    reuse: keep the subtree of the action played for the next move.
+    workers: if positive, that many worker processes each grow their own
+      tree from the root with iterations / workers simulations (root
+      parallelism) and their root visit counts are added up.  Trees are not
+      reused between moves in this mode.
+    """
 
-        results = [(action, exp_value(gameState.generateSuccessor(0, action), 0, 1)) for action in gameState.getLegalActions(0)]
-        results.sort(key=lambda x: x[1])
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '10', iterations = '500',
+                 timeLimit = None, rollout = 'random', exploration = '1.4', reuse = 'True',
+                 ghosts = 'uniform', workers = '0'):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, workers = workers)
+        self.iterations = int(iterations)
+        self.timeLimit = None if timeLimit is None else float(timeLimit)
+        if self.iterations <= 0 and self.timeLimit is None:
+            raise Exception('MCTSAgent needs iterations or a timeLimit')
+        if rollout == 'random':
+            self.rolloutPolicy = None
+        else:
+            self.rolloutPolicy = util.lookup(rollout, dict(vars(pacmanAgents), **globals()))()
+        self.exploration = float(exploration)
+        self.reuse = str(reuse) == 'True'
+        self.setGhostModel(ghosts)
+        self.root = None
+
+    def registerInitialState(self, gameState):
+        self.root = None
 
-        return results[-1][0]
+    def getAction(self, gameState: GameState):
+        if self.workers <= 0:
+            visits = self.searchTree(gameState, self.iterations)
+        else:
+            iterations = -(-self.iterations // self.workers)
+            tasks = [(gameState.pack(), random.getrandbits(32), iterations)
+                     for worker in range(self.workers)]
+            visits = {}
+            pool = self.getWorkerPool(gameState.data.layout)
+            for workerVisits in pool.map(_searchMonteCarloTree, tasks):
+                for action, (count, totalValue) in workerVisits.items():
+                    oldCount, oldTotal = visits.get(action, (0, 0.0))
+                    visits[action] = (oldCount + count, oldTotal + totalValue)
+
+        action = max(visits, key=lambda action: (visits[action][0],
+                                                 visits[action][1] / max(1, visits[action][0])))
+        if self.reuse and self.workers <= 0 and action in self.root.children:
+            self.root = self.root.children[action]
+            self.root.parent = None
+        else:
+            self.root = None
+        return action
+
+    def searchTree(self, gameState, iterations):
+        """
+        Runs the simulations for one move from gameState and returns the
+        root actions' {action: (visits, total value)}.
+        """
+        if self.root is None or not self.reuse or not self.root.matches(gameState):
+            self.root = _MCTSNode(gameState)
+        self.lowValue, self.highValue = math.inf, -math.inf
+        for child in self.root.children.values():
+            self.lowValue = min(self.lowValue, child.totalValue / child.visits)
+            self.highValue = max(self.highValue, child.totalValue / child.visits)
+        deadline = None if self.timeLimit is None else time.time() + self.timeLimit
+        count = 0
+        while (iterations <= 0 or count < iterations) and \
+                (deadline is None or time.time() < deadline):
+            self.runSimulation(gameState)
+            count += 1
+        if not self.root.children:
+            # The budget ran out before the first simulation
+            self.runSimulation(gameState)
+        return dict((action, (child.visits, child.totalValue))
+                    for action, child in self.root.children.items())
+
+    def runSimulation(self, gameState):
+        "Selection, expansion, rollout and backpropagation from the root."
+        node, state = self.root, gameState
+        while not (state.isWin() or state.isLose()):
+            if node.untriedActions is None:
+                node.untriedActions = state.getLegalActions(0)
+                random.shuffle(node.untriedActions)
+            if node.untriedActions:
+                action = node.untriedActions.pop()
+                state = self.simulateMove(state, action)
+                child = _MCTSNode(state, node, action)
+                node.children[action] = child
+                node = child
+                break
+            action, node = self.selectChild(node)
+            state = self.simulateMove(state, action)
+
+        value = self.rolloutValue(state)
+        self.lowValue = min(self.lowValue, value)
+        self.highValue = max(self.highValue, value)
+        while node is not None:
+            node.visits += 1
+            node.totalValue += value
+            node = node.parent
+
+    def selectChild(self, node):
+        "The (action, child) maximizing the UCT score."
+        low, scale = self.lowValue, self.highValue - self.lowValue
+        if not scale > 0:
+            low, scale = 0, 1
+        logVisits = math.log(node.visits)
+        bestScore, best = -math.inf, None
+        for action, child in node.children.items():
+            mean = (child.totalValue / child.visits - low) / scale
+            score = mean + self.exploration * math.sqrt(logVisits / child.visits)
+            if score > bestScore:
+                bestScore, best = score, (action, child)
+        return best
+
+    def simulateMove(self, gameState, action):
+        "Pacman takes action, then each ghost moves as sampled from the ghost model."
+        gameState = gameState.generateSuccessor(0, action)
+        for ghostIndex in range(1, gameState.getNumAgents()):
+            if gameState.isWin() or gameState.isLose():
+                break
+            distribution = self.getGhostDistribution(gameState, ghostIndex)
+            actions = [ghostAction for ghostAction, probability in distribution]
+            probabilities = [probability for ghostAction, probability in distribution]
+            gameState = gameState.generateSuccessor(ghostIndex, util.sample(probabilities, actions))
+        return gameState
+
+    def rolloutValue(self, gameState):
+        "Plays depth Pacman moves with the rollout policy and evaluates the result."
+        for move in range(self.depth):
+            if gameState.isWin() or gameState.isLose():
+                break
+            if self.rolloutPolicy is None:
+                actions = gameState.getLegalActions(0)
+                if len(actions) > 1 and Directions.STOP in actions:
+                    actions.remove(Directions.STOP)
+                action = random.choice(actions)
+            else:
+                action = self.rolloutPolicy.getAction(gameState)
+            gameState = self.simulateMove(gameState, action)
+        return self.evaluationFunction(gameState)
 
 def betterEvaluationFunction(currentGameState: GameState):
     """
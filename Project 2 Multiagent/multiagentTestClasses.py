@@ -180,6 +180,7 @@ class GradingAgent(Agent):
         self.seed = seed
 
     def registerInitialState(self, state):
+        GameState.setExploredTracking(GameState.EXPLORED_STATES)
         if 'registerInitialState' in dir(self.studentAgent):
             self.studentAgent.registerInitialState(state)
         random.seed(self.seed)
@@ -288,6 +289,7 @@ class PolyAgent(Agent):
         return (ourpac, alternative_depth_pacs, partial_ply_bug_pacs)
 
     def registerInitialState(self, state):
+        GameState.setExploredTracking(GameState.EXPLORED_STATES)
         for agent in self.solutionAgents + self.alternativeDepthAgents:
             if 'registerInitialState' in dir(agent):
                 agent.registerInitialState(state)
@@ -77,15 +77,36 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # Explored-state tracking is instrumentation for the autograder and is off
+    # during normal play.  In EXPLORED_STATES mode, every state passed to or
+    # returned by generateSuccessor is kept in the explored set; in
+    # EXPLORED_COUNT mode only the number of generateSuccessor calls is kept.
+    EXPLORED_OFF, EXPLORED_STATES, EXPLORED_COUNT = 'off', 'states', 'count'
+    exploredMode = EXPLORED_OFF
     explored = set()
+    exploredCount = 0
+
+
+    def setExploredTracking(mode):
+        GameState.exploredMode = mode
+        GameState.explored = set()
+        GameState.exploredCount = 0
+    setExploredTracking = staticmethod(setExploredTracking)
+
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
+        tmp = GameState.explored
         GameState.explored = set()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+
+    def getAndResetExploredCount():
+        tmp = GameState.exploredCount
+        GameState.exploredCount = 0
+        return tmp
+    getAndResetExploredCount = staticmethod(getAndResetExploredCount)
+
     def getLegalActions(self, agentIndex=0):
         """
         Returns the legal actions for the agent specified.
@@ -127,10 +148,14 @@ class GameState:
         GhostRules.checkDeath(state, agentIndex)
 
         # Book keeping
+        state.data.rehashAgents()
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.exploredMode != GameState.EXPLORED_OFF:
+            GameState.exploredCount += 1
+            if GameState.exploredMode == GameState.EXPLORED_STATES:
+                GameState.explored.add(self)
+                GameState.explored.add(state)
         return state
 
     def getLegalPacmanActions(self):
@@ -240,6 +265,17 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def pack(self):
+        "A compact, picklable tuple describing this state; see GameState.unpack."
+        return self.data.pack()
+
+    def unpack(packed, layout):
+        "Rebuilds a GameState from the result of pack and the layout it was played on."
+        state = GameState()
+        state.data.unpack(packed, layout)
+        return state
+    unpack = staticmethod(unpack)
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -348,7 +384,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(state.getPacmanState().configuration, state.data.layout.walls)
+        return Actions.getPossibleActions(state.data.agentStates[0].configuration, state.data.layout.walls, state.data.layout.moveTable)
     getLegalActions = staticmethod(getLegalActions)
 
     def applyAction(state, action):
@@ -359,7 +395,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.copyAgentState(0)
 
         # Update Configuration
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -379,8 +415,7 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.removeFood(x, y)
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -389,11 +424,11 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if(position in state.getCapsules()):
-            state.data.capsules.remove(position)
+            state.data.removeCapsule(position)
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.copyAgentState(index).scaredTimer = SCARED_TIME
     consume = staticmethod(consume)
 
 
@@ -410,7 +445,7 @@ class GhostRules:
         """
         conf = state.getGhostState(ghostIndex).configuration
         possibleActions = Actions.getPossibleActions(
-            conf, state.data.layout.walls)
+            conf, state.data.layout.walls, state.data.layout.moveTable)
         reverse = Actions.reverseDirection(conf.direction)
         if Directions.STOP in possibleActions:
             possibleActions.remove(Directions.STOP)
@@ -425,7 +460,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.copyAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0:
             speed /= 2.0
@@ -435,6 +470,7 @@ class GhostRules:
     applyAction = staticmethod(applyAction)
 
     def decrementTimer(ghostState):
+        # ghostState must not be shared with other states (see copyAgentState)
         timer = ghostState.scaredTimer
         if timer == 1:
             ghostState.configuration.pos = nearestPoint(
@@ -449,12 +485,14 @@ class GhostRules:
                 ghostState = state.data.agentStates[index]
                 ghostPosition = ghostState.configuration.getPosition()
                 if GhostRules.canKill(pacmanPosition, ghostPosition):
-                    GhostRules.collide(state, ghostState, index)
+                    GhostRules.collide(
+                        state, state.data.copyAgentState(index), index)
         else:
             ghostState = state.data.agentStates[agentIndex]
             ghostPosition = ghostState.configuration.getPosition()
             if GhostRules.canKill(pacmanPosition, ghostPosition):
-                GhostRules.collide(state, ghostState, agentIndex)
+                GhostRules.collide(
+                    state, state.data.copyAgentState(agentIndex), agentIndex)
     checkDeath = staticmethod(checkDeath)
 
     def collide(state, ghostState, agentIndex):
@@ -463,6 +501,7 @@ class GhostRules:
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -554,6 +593,10 @@ def readCommand(argv):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--numpyGrids', action='store_true', dest='numpyGrids',
+                      help='Store walls and food in numpy-backed grids', default=False)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Number of processes to play games in; more than 1 implies -q'), default=1)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -565,6 +608,9 @@ def readCommand(argv):
         random.seed('cs188')
 
     # Choose a layout
+    if options.numpyGrids:
+        import game
+        game.useNumpyGrids()
     args['layout'] = layout.getLayout(options.layout)
     if args['layout'] == None:
         raise Exception("The layout " + options.layout + " cannot be found")
@@ -591,7 +637,7 @@ def readCommand(argv):
     args['ghosts'] = [ghostType(i+1) for i in range(options.numGhosts)]
 
     # Choose a display format
-    if options.quietGraphics:
+    if options.quietGraphics or options.workers > 1:
         import textDisplay
         args['display'] = textDisplay.NullGraphics()
     elif options.textGraphics:
@@ -606,6 +652,7 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['workers'] = options.workers
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -672,7 +719,18 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30, workers=1):
+    """
+    Plays numGames games and prints a summary of the results.
+
+    Returns the Game objects of the non-training games, or, when workers > 1,
+    the per-game result dictionaries returned by runGamesInParallel.
+    """
+    if workers > 1:
+        if numTraining > 0 or record:
+            raise Exception('Training and recording games need workers=1')
+        return runGamesInParallel(layout, pacman, ghosts, numGames, workers, catchExceptions, timeout)
+
     import __main__
     __main__.__dict__['_display'] = display
 
@@ -708,17 +766,95 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, c
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
         wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        print('Average Score:', sum(scores) / float(len(scores)))
-        print('Scores:       ', ', '.join([str(score) for score in scores]))
-        print('Win Rate:      %d/%d (%.2f)' %
-              (wins.count(True), len(wins), winRate))
-        print('Record:       ', ', '.join(
-            [['Loss', 'Win'][int(w)] for w in wins]))
+        printSummary(scores, wins)
 
     return games
 
 
+def printSummary(scores, wins):
+    winRate = wins.count(True) / float(len(wins))
+    print('Average Score:', sum(scores) / float(len(scores)))
+    print('Scores:       ', ', '.join([str(score) for score in scores]))
+    print('Win Rate:      %d/%d (%.2f)' %
+          (wins.count(True), len(wins), winRate))
+    print('Record:       ', ', '.join(
+        [['Loss', 'Win'][int(w)] for w in wins]))
+
+
+def runGamesInParallel(layout, pacman, ghosts, numGames, workers, catchExceptions=False, timeout=30):
+    """
+    Plays numGames headless games in a pool of worker processes and prints the
+    same summary as runGames.
+
+    Game i is seeded from a master seed drawn from the random module, so fixing
+    the random seed (-f) reproduces every game no matter which worker plays it.
+    Each worker gets its own copy of the agents, so agents cannot learn across
+    games.
+
+    Returns a list of result dictionaries, in game order, with keys 'index',
+    'seed', 'score', 'win', 'moves', 'agentTimes', 'crashed' and 'timedOut'.
+    """
+    import multiprocessing
+    masterSeed = random.getrandbits(32)
+    seeds = random.Random(masterSeed)
+    tasks = [(i, seeds.getrandbits(32)) for i in range(numGames)]
+    results = [None for i in range(numGames)]
+
+    pool = multiprocessing.Pool(workers, _initGameWorker,
+                                (layout, pacman, ghosts, catchExceptions, timeout))
+    try:
+        for result in pool.imap_unordered(_playWorkerGame, tasks):
+            results[result['index']] = result
+    finally:
+        pool.close()
+        pool.join()
+
+    if numGames > 0:
+        printSummary([r['score'] for r in results], [r['win'] for r in results])
+        numAgents = len(results[0]['agentTimes'])
+        print('Agent Times:  ', ', '.join(['%.2fs' % (sum([r['agentTimes'][i] for r in results]) / numGames)
+                                           for i in range(numAgents)]), '(average per game)')
+    return results
+
+
+_workerGame = None
+
+
+def _initGameWorker(layout, pacman, ghosts, catchExceptions, timeout):
+    "Keeps the game setup in the worker process, so tasks only carry seeds."
+    global _workerGame
+    for agent in [pacman] + ghosts:
+        agent.getAction = _timeAgentAction(agent.getAction, agent)
+    _workerGame = (layout, pacman, ghosts, catchExceptions, timeout)
+
+
+def _timeAgentAction(getAction, agent):
+    def timedGetAction(state):
+        start = time.time()
+        try:
+            return getAction(state)
+        finally:
+            agent._workerTime += time.time() - start
+    return timedGetAction
+
+
+def _playWorkerGame(task):
+    import textDisplay
+    index, seed = task
+    layout, pacman, ghosts, catchExceptions, timeout = _workerGame
+    random.seed(seed)
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacman, ghosts,
+                         textDisplay.NullGraphics(), True, catchExceptions)
+    for agent in game.agents:
+        agent._workerTime = 0.0
+    game.run()
+    return {'index': index, 'seed': seed, 'score': game.state.getScore(),
+            'win': game.state.isWin(), 'moves': len(game.moveHistory),
+            'agentTimes': [agent._workerTime for agent in game.agents],
+            'crashed': game.agentCrashed, 'timedOut': game.agentTimeout}
+
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -77,15 +77,36 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # Explored-state tracking is instrumentation for the autograder and is off
+    # during normal play.  In EXPLORED_STATES mode, every state passed to or
+    # returned by generateSuccessor is kept in the explored set; in
+    # EXPLORED_COUNT mode only the number of generateSuccessor calls is kept.
+    EXPLORED_OFF, EXPLORED_STATES, EXPLORED_COUNT = 'off', 'states', 'count'
+    exploredMode = EXPLORED_OFF
     explored = set()
+    exploredCount = 0
+
+
+    def setExploredTracking(mode):
+        GameState.exploredMode = mode
+        GameState.explored = set()
+        GameState.exploredCount = 0
+    setExploredTracking = staticmethod(setExploredTracking)
+
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
+        tmp = GameState.explored
         GameState.explored = set()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+
+    def getAndResetExploredCount():
+        tmp = GameState.exploredCount
+        GameState.exploredCount = 0
+        return tmp
+    getAndResetExploredCount = staticmethod(getAndResetExploredCount)
+
     def getLegalActions(self, agentIndex=0):
         """
         Returns the legal actions for the agent specified.
@@ -129,8 +150,11 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.exploredMode != GameState.EXPLORED_OFF:
+            GameState.exploredCount += 1
+            if GameState.exploredMode == GameState.EXPLORED_STATES:
+                GameState.explored.add(self)
+                GameState.explored.add(state)
         return state
 
     def getLegalPacmanActions(self):
@@ -151,7 +151,7 @@ def computeDistances(layout):
         for node in allNodes:
             dist[node] = 1000000000
         import util
-        queue = util.PriorityQueue()
+        queue = util.IndexedPriorityQueue()
         queue.push(source, 0)
         dist[source] = 0
         while not queue.isEmpty():
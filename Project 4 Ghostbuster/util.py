@@ -223,6 +223,124 @@ class PriorityQueueWithFunction(PriorityQueue):
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
 
+class IndexedPriorityQueue:
+    """
+      A binary heap that also keeps a map from each item to its position in
+      the heap.  This gives O(log n) update/decreaseKey and O(1) membership
+      tests, at the cost of requiring items to be hashable.  Unlike
+      PriorityQueue, an item is stored at most once: pushing an item that is
+      already queued behaves like update.
+
+      remove() is lazy: the entry is tombstoned and skipped when it reaches the
+      top of the heap, so removal is O(1).
+    """
+    REMOVED = object()
+
+    def __init__(self):
+        self.heap = []
+        self.index = {}
+        self.count = 0
+
+    def push(self, item, priority):
+        self.update(item, priority)
+
+    def pop(self):
+        while self.heap:
+            entry = self.heap[0]
+            last = self.heap.pop()
+            if self.heap:
+                self.heap[0] = last
+                self._siftDown(0)
+            if entry[2] is not self.REMOVED:
+                del self.index[entry[2]]
+                return entry[2]
+        raise IndexError('pop from an empty priority queue')
+
+    def isEmpty(self):
+        return len(self.index) == 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def contains(self, item):
+        return item in self.index
+
+    def getPriority(self, item):
+        return self.heap[self.index[item]][0]
+
+    def update(self, item, priority):
+        # If item already in priority queue with higher priority, lower it in place.
+        # If item already in priority queue with equal or lower priority, do nothing.
+        # If item not in priority queue, insert it.
+        if item in self.index:
+            if self.heap[self.index[item]][0] > priority:
+                self.decreaseKey(item, priority)
+            return
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.heap.append(entry)
+        self.index[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def decreaseKey(self, item, priority):
+        "Lowers the priority of an item that is already in the queue."
+        position = self.index[item]
+        entry = self.heap[position]
+        if priority > entry[0]:
+            raise ValueError('decreaseKey cannot raise the priority of an item')
+        entry[0] = priority
+        self._siftUp(position)
+
+    def remove(self, item):
+        "Lazily deletes an item; its heap slot is discarded when popped."
+        position = self.index.pop(item)
+        self.heap[position][2] = self.REMOVED
+
+    def _siftUp(self, position):
+        heap, index = self.heap, self.index
+        entry = heap[position]
+        key = (entry[0], entry[1])
+        while position > 0:
+            parentPosition = (position - 1) >> 1
+            parent = heap[parentPosition]
+            if (parent[0], parent[1]) <= key:
+                break
+            heap[position] = parent
+            self._place(parent, position)
+            position = parentPosition
+        heap[position] = entry
+        self._place(entry, position)
+
+    def _siftDown(self, position):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[position]
+        key = (entry[0], entry[1])
+        while True:
+            childPosition = 2 * position + 1
+            if childPosition >= size:
+                break
+            rightPosition = childPosition + 1
+            if rightPosition < size and \
+                    (heap[rightPosition][0], heap[rightPosition][1]) < (heap[childPosition][0], heap[childPosition][1]):
+                childPosition = rightPosition
+            child = heap[childPosition]
+            if key <= (child[0], child[1]):
+                break
+            heap[position] = child
+            self._place(child, position)
+            position = childPosition
+        heap[position] = entry
+        self._place(entry, position)
+
+    def _place(self, entry, position):
+        if entry[2] is not self.REMOVED:
+            self.index[entry[2]] = position
+
+
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
     return abs( xy1[0] - xy2[0] ) + abs( xy1[1] - xy2[1] )